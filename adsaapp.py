@@ -18,6 +18,10 @@ class ADSAApp():
         self.app = app
         height, width = self.app.stdscr.getmaxyx()
         self.widgets = {}
+        # The graphs are loaded once, so that their memoized results are reused between the menus,
+        # and their distance matrices are kept on disk between the sessions.
+        self.graphs = {}
+        self.disk_cache = DiskCache(".cache")
 
         # Main Menu
         texts_main_menu = ["Choose a step:", "Step 1", "Step 2", "Step 3", "Step 4", "Exit"]
@@ -115,48 +119,75 @@ class ADSAApp():
         names = ["Reactor", "UpperE", "LowerE", "Security", "Electrical",
                  "Medbay", "Storage", "Cafetaria", "Unnamed1", "Unnamed2",
                  "O2", "Weapons", "Shield", "Navigations"]
-        graph_crewmates = Graph(0)
-        graph_crewmates.import_from_file(filepath_crewmates)
-        distances = graph_crewmates.floydWarshall()
+        graph_crewmates = self._get_graph(filepath_crewmates)
+        distances = graph_crewmates.floydWarshall(next_hop=True)
         df_crewmates = pd.DataFrame(data=distances, index=names, columns=names)
         lines = df_crewmates.__str__().split("\n")
         screen_game.insert_line("CREWMATES")
         for line in lines:
             screen_game.insert_line(line)
+        self._insert_routes(screen_game, graph_crewmates, names)
 
         names = ["Reactor", "UpperE", "LowerE", "Security", "Electrical",
                  "Medbay", "Storage", "Cafetaria", "Unnamed1", "Unnamed2",
                  "O2", "Weapons", "Shield", "Navigations", "CorridorW"]
-        graph_impostors = Graph(0)
-        graph_impostors.import_from_file(filepath_impostors)
-        distances = graph_impostors.floydWarshall()
+        graph_impostors = self._get_graph(filepath_impostors)
+        distances = graph_impostors.floydWarshall(next_hop=True)
         df_impostors = pd.DataFrame(data=distances, index=names, columns=names)
         lines = df_impostors.__str__().split("\n")
         screen_game.insert_line("")
         screen_game.insert_line("IMPOSTORS")
         for line in lines:
             screen_game.insert_line(line)
+        self._insert_routes(screen_game, graph_impostors, names)
         screen_game.start(self.app)
 
+    def _insert_routes(self, screen_game, graph, names):
+        pairs = [(i, j) for i in range(graph.nb_vertex) for j in range(i + 1, graph.nb_vertex)]
+        screen_game.insert_line("")
+        screen_game.insert_line("Routes:")
+        for (i, j), path in zip(pairs, graph.paths(pairs)):
+            route = "unreachable" if path is None else " > ".join(names[vertex] for vertex in path)
+            screen_game.insert_line(f"  {names[i]} -> {names[j]} ({graph.dist[i, j]}): {route}")
+
+    def _get_graph(self, filepath):
+        if filepath not in self.graphs:
+            graph = Graph(0, disk_cache=self.disk_cache)
+            graph.import_from_file(filepath)
+            self.graphs[filepath] = graph
+        return self.graphs[filepath]
+
     def step4(self):
-        step4app = Step4App(self.app)
+        step4app = Step4App(self.app, graph=self._get_graph("data/graph_crewmates.txt"))
         step4app.start()
 
     def display_step4(self, adjmatrix_path="data/graph_crewmates.txt", pos_path="data/coordinates.txt"):
-        graph = Graph(0)
-        graph.import_from_file(adjmatrix_path)
-        paths = graph.get_all_hamilton_path()
+        graph = self._get_graph(adjmatrix_path)
+        counts = graph.count_hamilton_paths_matrix()
         height, width = self.app.stdscr.getmaxyx()
         screen_game = FakeScreen([5, 5], [height - 10, width - 10])
+        pd.set_option('display.max_rows', 500)
+        pd.set_option('display.max_columns', 500)
+        pd.set_option('display.expand_frame_repr', False)
         screen_game.insert_line(f"Graph with {graph.nb_vertex} vertices and {graph.nb_edge} edges.")
-        screen_game.insert_line(f"This graph contains {len(paths)} hamilton paths.")
-        shortest_path = graph.get_shortest_path(paths)
-        screen_game.insert_line(f"Shortest path -> {shortest_path}")
+        screen_game.insert_line(f"This graph contains {counts.sum()} hamilton paths.")
+        df_counts = pd.DataFrame(data=counts, index=graph.label, columns=graph.label)
+        for line in df_counts.__str__().split("\n"):
+            screen_game.insert_line(line)
+        shortest_path = graph.get_shortest_hamilton_path(method="held_karp")
+        if shortest_path is None:
+            screen_game.insert_line("No Hamilton paths")
+            screen_game.insert_line("Press the escape key to continue...")
+            screen_game.start(self.app)
+            return None
+        screen_game.insert_line(f"Shortest path -> {shortest_path[0]}")
+        screen_game.insert_line(f"Min weight -> {shortest_path[1]}")
         screen_game.insert_line("Press the escape key to display the shortest path...")
         screen_game.start(self.app)
 
-        graph.set_path(shortest_path)
-        graph.plot(filepos=pos_path)
+        path_graph = graph.copy()
+        path_graph.set_path(shortest_path[0])
+        path_graph.plot(filepos=pos_path)
         plt.show()
 
     def _get_coord_centered(self, height, width, texts):
@@ -170,18 +201,24 @@ class ADSAApp():
 
 
 class Step4App():
-    def __init__(self, app=None, adjmatrix_path="data/graph_crewmates.txt", pos_path="data/coordinates.txt"):
+    def __init__(self, app=None, adjmatrix_path="data/graph_crewmates.txt", pos_path="data/coordinates.txt", solver="held_karp", processes=1,
+                 graph=None):
         if app is None:
             app = App()
         self.app = app
         height, width = self.app.stdscr.getmaxyx()
         self.widgets = {}
-        self.graph = Graph(0)
-        self.graph.import_from_file(adjmatrix_path)
+        if graph is None:
+            graph = Graph(0)
+            graph.import_from_file(adjmatrix_path)
+        self.graph = graph
         self.pos_path = pos_path
 
         self.src_vertex = range(self.graph.nb_vertex)
         self.dst_vertex = range(self.graph.nb_vertex)
+        self.solvers = ["backtrack", "branch_and_bound", "held_karp", "heuristic"]
+        self.solver = solver
+        self.processes = processes
 
         # Main Menu
         texts_main_menu = ["Choose an option for finding a Hamilton path:",
@@ -189,6 +226,7 @@ class Step4App():
                            "Minium at a specific source vertex",
                            "Minimum at a specific destination vertex",
                            "Minium at a specific source and destination vertices",
+                           "Choose the solver",
                            "Exit"]
         main_menu = Menu(self._get_coord_centered(height, width, texts_main_menu),
                          texts_main_menu,
@@ -219,6 +257,19 @@ class Step4App():
         menu_dst_vertex.bind(lambda choice: self.menu_dst_vertex(choice))
         self.widgets["menu_dst_vertex"] = menu_dst_vertex
 
+        # Solver menu
+        texts_menu_solver = ["Choose a solver:",
+                             "Backtracking (enumerate every path)",
+                             "Branch and bound (prune the heavier paths)",
+                             "Held-Karp (dynamic programming)",
+                             "Heuristic (2-opt / Or-opt, 1 second)"]
+        menu_solver = Menu(self._get_coord_centered(height, width, texts_menu_solver),
+                           texts_menu_solver,
+                           True,
+                           True)
+        menu_solver.bind(lambda choice: self.menu_solver(choice))
+        self.widgets["menu_solver"] = menu_solver
+
     def main_menu(self, choice):
         if choice == 1:
             self.min_hamilton_path()
@@ -235,6 +286,11 @@ class Step4App():
             self.widgets["menu_src_vertex"].start(self.app)
             self.widgets["menu_dst_vertex"].start(self.app)
             self.min_hamilton_path()
+        if choice == 5:
+            self.app.stdscr.clear()
+            self.widgets["menu_solver"].start(self.app)
+            self.app.stdscr.clear()
+            return True
 
     def min_hamilton_path(self, src_vertex=None, dst_vertex=None):
         self.app.stdscr.clear()
@@ -244,7 +300,17 @@ class Step4App():
             dst_vertex = self.dst_vertex
 
         graph = self.graph
-        paths = graph.get_hamilton_path(src_vertex, dst_vertex)
+        if self.solver == "backtrack":
+            paths = graph.get_hamilton_path(src_vertex, dst_vertex, self.processes)
+            nb_paths = len(paths)
+            result = graph.get_shortest_path(paths) if paths else None
+        elif self.solver == "heuristic":
+            # Counting the paths would cost as much as the exact solvers.
+            nb_paths = None
+            result = graph.approximate_hamilton_path(src_vertex, dst_vertex, processes=self.processes)
+        else:
+            nb_paths = graph.count_hamilton_paths(src_vertex, dst_vertex)
+            result = graph.get_shortest_hamilton_path(src_vertex, dst_vertex, method=self.solver, processes=self.processes)
         height, width = self.app.stdscr.getmaxyx()
         screen_game = FakeScreen([5, 5], [height - 10, width - 10])
         screen_game.insert_line(f"Graph with {graph.nb_vertex} vertices and {graph.nb_edge} edges.")
@@ -252,23 +318,28 @@ class Step4App():
         screen_game.insert_line(f"Starting vertex label: {[self.graph.label[i] for i in src_vertex]}")
         screen_game.insert_line(f"Ending vertex index: {dst_vertex}")
         screen_game.insert_line(f"Ending vertex label: {[self.graph.label[i] for i in dst_vertex]}")
-        if not paths:
+        screen_game.insert_line(f"Solver: {self.solver}")
+        if result is None:
             screen_game.insert_line("")
             screen_game.insert_line("No Hamilton paths")
             screen_game.insert_line("Press the escape key to continue...")
             screen_game.start(self.app)
         else:
             screen_game.insert_line("")
-            screen_game.insert_line(f"{len(paths)} hamilton paths found.")
-            shortest_path, min_weight = graph.get_shortest_path(paths)
+            if nb_paths is not None:
+                screen_game.insert_line(f"{nb_paths} hamilton paths found.")
+            shortest_path, min_weight = result[:2]
             screen_game.insert_line(f"Shortest path index -> {shortest_path}")
             screen_game.insert_line(f"Shortest path label -> {[self.graph.label[i] for i in shortest_path]}")
             screen_game.insert_line(f"Min weight -> {min_weight}")
+            if self.solver == "heuristic":
+                screen_game.insert_line(f"At most {result[2]:.1%} above the optimum")
             screen_game.insert_line("")
             screen_game.insert_line("Press the escape key to display the shortest path...")
             screen_game.start(self.app)
-            graph.set_path(shortest_path)
-            graph.plot(filepos=self.pos_path)
+            path_graph = graph.copy()
+            path_graph.set_path(shortest_path)
+            path_graph.plot(filepos=self.pos_path)
             plt.show()
 
     def menu_src_vertex(self, choice):
@@ -283,6 +354,9 @@ class Step4App():
         else:
             self.dst_vertex = [choice - 1]
 
+    def menu_solver(self, choice):
+        self.solver = self.solvers[choice - 1]
+
     def _get_coord_centered(self, height, width, texts):
         max_length = len(max(texts, key=len))
         y = int(height / 2 - len(texts) / 2)
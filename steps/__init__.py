@@ -1,3 +1,4 @@
 from .graph.graph import Graph
+from .graph.diskcache import DiskCache
 from .step1 import *
 from .step2 import *
@@ -1 +1,2 @@
 from .graph import Graph
+from .diskcache import DiskCache
@@ -0,0 +1,84 @@
+import os
+import numpy as np
+
+# Default maximal size of a cache directory, in bytes.
+DISK_CACHE_SIZE = 256 * 1024 * 1024
+
+
+class DiskCache():
+    """A directory of numpy arrays stored as `.npy` files, with a size cap.
+
+    The arrays are memory-mapped when read back. When the files take more than
+    `max_size` bytes, the least recently used ones are deleted.
+
+    :param str directory: The directory of the files, created if needed.
+    :param int max_size: The maximal size of the files in bytes. (Default DISK_CACHE_SIZE)
+    """
+
+    def __init__(self, directory, max_size=DISK_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    def _get_filename(self, key):
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def get(self, key, mmap_mode="c"):
+        """Read the array stored under `key`.
+
+        :param str key: The key of the array, usable as a file name.
+        :param str mmap_mode: The `numpy.load` mode, or None to read the array in memory.
+            The default copy-on-write mode never writes the file. (Default "c")
+        :return: The array if it is in the cache, None otherwise.
+        :rtype: numpy.ndarray or None
+        """
+
+        filename = self._get_filename(key)
+        try:
+            array = np.load(filename, mmap_mode=mmap_mode)
+            # The modification time orders the eviction.
+            os.utime(filename)
+        except (OSError, ValueError):
+            return None
+        return array
+
+    def put(self, key, array):
+        """Store `array` under `key`, then evict the least recently used files over the size cap.
+
+        The file is written under a temporary name and renamed, so a reader never sees it incomplete.
+
+        :param str key: The key of the array, usable as a file name.
+        :param numpy.ndarray array: The array to store.
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+        filename = self._get_filename(key)
+        temporary = f"{filename}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            np.save(file, array)
+        os.replace(temporary, filename)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+
+    def clear(self):
+        """Delete every array of the cache."""
+
+        if not os.path.isdir(self.directory):
+            return None
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                os.remove(entry.path)
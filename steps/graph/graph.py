@@ -1,23 +1,232 @@
+from collections import OrderedDict
+from functools import wraps
 from math import inf
+import hashlib
+import heapq
+import json
 import numpy as np
-from copy import copy
 import networkx as nx
-from .unionfind import UnionFind
+from .spanningtree import kruskal, prim, boruvka, get_spanning_tree_method, IncrementalSpanningForest
+from .hamilton import held_karp, backtrack_hamilton, parallel_backtrack_hamilton, count_hamilton_paths, count_hamilton_paths_matrix
+from .hamilton import anytime_hamilton
+from .shortestpath import dijkstra, dijkstra_path, dist_path, all_pairs_dijkstra, get_nb_processes
 from utils.utils import read_coordinates
 
+# Binary format: a fixed-size header, the labels as JSON, then the 64-byte aligned arrays:
+# the float64 adjacency matrix ("dense") or the u, v, weight edge arrays ("sparse" and
+# "packed"), optionally followed by the float64 distance matrix.
+BINARY_MAGIC = b"ADSAGRPH"
+BINARY_VERSION = 1
+BINARY_HEADER = np.dtype([("magic", "S8"),
+                          ("version", "<u4"),
+                          ("flags", "<u4"),
+                          ("nb_vertex", "<u8"),
+                          ("nb_edge", "<u8"),
+                          ("labels_size", "<u8")])
+BINARY_ALIGNMENT = 64
+FLAG_SPARSE = 1
+FLAG_DIST = 2
+FLAG_PACKED = 4
+# Bumped when the cached distance matrices stop matching the files they are computed from.
+DISK_CACHE_VERSION = 1
+# Default number of results kept by the memoized methods of a graph.
+RESULT_CACHE_SIZE = 32
+# Number of hop weights gathered at once by `Graph.get_path_weights`, bounding its memory.
+PATH_WEIGHT_CHUNK = 1 << 20
+
+
+def get_packed_index(low, high):
+    """Return the position of the edge (`low`, `high`), `low` < `high`, in a packed upper triangle.
+
+    The triangle is stored column by column, so the edges of the first n vertices
+    are a prefix of the edges of the first n + 1 vertices.
+    """
+
+    return high * (high - 1) // 2 + low
+
+
+def _freeze(value):
+    """Convert the sequences in the arguments of a memoized method to hashable tuples."""
+
+    if isinstance(value, (list, tuple, range, np.ndarray)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _copy_result(result):
+    """Copy the containers of a memoized result, so that the caller can't modify the cache."""
+
+    if isinstance(result, (np.ndarray, set, dict)):
+        return result.copy()
+    if isinstance(result, (list, tuple)):
+        items = [_copy_result(item) if isinstance(item, (list, tuple, np.ndarray, set, dict)) else item
+                 for item in result]
+        return items if isinstance(result, list) else tuple(items)
+    return result
+
+
+def memoize(method):
+    """Cache the results of a `Graph` method by version of the graph and arguments.
+
+    The least recently used results are evicted when the graph holds more than
+    `cache_size` of them, and every modification of the graph clears them.
+    """
+
+    @wraps(method)
+    def memoized(self, *args, **kwargs):
+        key = (method.__name__, self._version, _freeze(args), _freeze(sorted(kwargs.items())))
+        try:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return _copy_result(self._results[key])
+        except TypeError:
+            return method(self, *args, **kwargs)
+        result = method(self, *args, **kwargs)
+        if key[1] == self._version and self.cache_size > 0:
+            self._results[key] = result
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+        return _copy_result(result)
+    return memoized
+
 
 class Graph():
     """
-    Graph implementation with an adjacency matrix.
+    Graph implementation with an adjacency matrix or adjacency lists.
+
+    With the "dense" storage the edges are stored in a `nb_vertex` x `nb_vertex` matrix
+    filled with `inf`. The matrix is a view on a larger buffer whose capacity doubles
+    when it is full, so adding vertices one by one is amortized. With the "packed"
+    storage only the upper triangle, without the diagonal, is stored in a flat buffer,
+    see `get_packed_index`, so the self-loops are ignored. The neighbors of the matrix
+    storages are kept in one bitmask per vertex, n²/8 bytes, updated on every edge
+    change. With the
+    "sparse" storage each vertex stores a dictionary mapping its neighbors to the weight
+    of the edge, there is no matrix, so the memory grows with the number of edges.
+
+    A compact `dtype` such as float32 or int32 halves the size of the matrix, the
+    integer dtypes truncate the weights and mark the missing edges with their maximal
+    value instead of `inf`. Packed with a 4-byte dtype, the matrix takes 4x less memory
+    than the dense float64 one. The storage is transparent to the other methods, which
+    read the weights as float64 with `inf` for no edge: the shortest paths and the
+    Hamiltonian solvers still work on a temporary float64 matrix.
+
+    Every modification of the edges or vertices through the methods of the class
+    increments a version counter, the results computed from the edges are cached
+    against it. (!! Writing directly in `adj_matrix` bypasses it. !!) The expensive
+    queries are memoized, see `memoize`. With a `disk_cache`, the distance matrices of
+    a graph freshly imported from a file are stored on disk, keyed by the hash of the
+    file, and read back by the next sessions.
 
     :param int nb_vertex: Number of vertices to initialize the graph with. (Default 0)
+    :param str storage: The storage of the edges, "dense", "packed" or "sparse". (Default "dense")
+    :param int cache_size: The number of memoized results kept, 0 to disable. (Default RESULT_CACHE_SIZE)
+    :param DiskCache disk_cache: The cache of the distance matrices. (Default None, no disk cache)
+    :param dtype: The dtype of the matrix of the "dense" and "packed" storages. (Default numpy.float64)
     """
 
-    def __init__(self, nb_vertex=0):
-        self.adj_matrix = np.ones((nb_vertex, nb_vertex)) * inf
+    def __init__(self, nb_vertex=0, storage="dense", cache_size=RESULT_CACHE_SIZE, disk_cache=None, dtype=np.float64):
+        if storage not in ("dense", "packed", "sparse"):
+            raise ValueError(f"Unknown storage `{storage}`.")
+        self.storage = storage
+        self._set_dtype(dtype)
+        self._init_storage(nb_vertex)
         self.label = [i for i in range(nb_vertex)]
-        for i in range(nb_vertex):
-            self.adj_matrix[i, i] = 0
+        self.label_index = {i: i for i in range(nb_vertex)}
+        self._version = 0
+        self._edges_cache = None
+        self._neighbors_cache = None
+        self._weighted_neighbors_cache = None
+        self._dist_version = None
+        self.next_hop = None
+        self._next_hop_version = None
+        self.cache_size = cache_size
+        self._results = OrderedDict()
+        self.disk_cache = disk_cache
+        self._source = None
+
+    def _touch(self):
+        """Increment the version of the graph, invalidating the cached results."""
+
+        self._version += 1
+        self._results.clear()
+
+    def copy(self):
+        """Return a copy of the graph, without its cached results.
+
+        :return: A graph with the same vertices, labels and edges.
+        :rtype: Graph
+        """
+
+        graph = Graph(0, self.storage, self.cache_size, self.disk_cache, self.dtype)
+        graph._nb_vertex = self._nb_vertex
+        if self.storage == "sparse":
+            graph._adj = [dict(adj) for adj in self._adj]
+        elif self.storage == "dense":
+            graph._buffer = np.array(self.adj_matrix)
+            graph.adj_matrix = graph._buffer
+        elif self.storage == "packed":
+            graph._buffer = np.array(self._packed)
+            graph._packed = graph._buffer
+        if self.storage != "sparse":
+            graph._neighbor_bits = self._neighbor_bits.copy()
+        graph.label = list(self.label)
+        graph.label_index = dict(self.label_index)
+        return graph
+
+    def _set_dtype(self, dtype):
+        """Set the dtype of the matrix and its value for no edge, `inf` or the maximal integer."""
+
+        self.dtype = np.dtype(dtype)
+        if np.issubdtype(self.dtype, np.floating):
+            self._no_edge = self.dtype.type(inf)
+        elif np.issubdtype(self.dtype, np.integer):
+            self._no_edge = np.iinfo(self.dtype).max
+        else:
+            raise ValueError(f"Unknown dtype `{self.dtype}`.")
+
+    def _to_raw(self, weights):
+        """Convert float64 weights, `inf` meaning no edge, to the dtype of the matrix."""
+
+        weights = np.asarray(weights, dtype=np.float64)
+        if self._no_edge == inf:
+            return weights.astype(self.dtype)
+        raw = np.where(weights == inf, self._no_edge, weights)
+        if not np.isfinite(raw).all() or (raw[weights != inf] >= self._no_edge).any():
+            raise ValueError(f"The weights don't fit in `{self.dtype}`.")
+        return raw.astype(self.dtype)
+
+    def _from_raw(self, raw):
+        """Convert weights read in the matrix to float64, `inf` meaning no edge."""
+
+        weights = np.asarray(raw, dtype=np.float64)
+        if self._no_edge == inf:
+            return weights
+        return np.where(raw == self._no_edge, inf, weights)
+
+    def _init_storage(self, nb_vertex, capacity=None):
+        """Initialize the storage with `nb_vertex` vertices and no edge.
+
+        :param int nb_vertex: The number of vertices.
+        :param int capacity: The number of vertices the buffer can hold. (Default None, `nb_vertex`)
+        """
+
+        self._nb_vertex = nb_vertex
+        self._adj = [{} for i in range(nb_vertex)] if self.storage == "sparse" else None
+        # `__getattr__` builds `adj_matrix` when the storage isn't dense.
+        self.__dict__.pop("adj_matrix", None)
+        if capacity is None:
+            capacity = nb_vertex
+        if self.storage != "sparse":
+            # Bit j % 8 of `_neighbor_bits[i, j // 8]` is set if i and j are neighbors.
+            self._neighbor_bits = np.zeros((capacity, (capacity + 7) // 8), dtype=np.uint8)
+        if self.storage == "packed":
+            self._buffer = np.full(capacity * (capacity - 1) // 2, self._no_edge, dtype=self.dtype)
+            self._packed = self._buffer[:nb_vertex * (nb_vertex - 1) // 2]
+        elif self.storage == "dense":
+            self._buffer = np.full((capacity, capacity), self._no_edge, dtype=self.dtype)
+            np.fill_diagonal(self._buffer, 0)
+            self.adj_matrix = self._buffer[:nb_vertex, :nb_vertex]
 
     def get_edges(self, weight=True):
         """Get the edges from the graph.
@@ -27,14 +236,44 @@ class Graph():
         :rtype: list
         """
 
-        edges = []
-        for i in range(self.nb_vertex - 1):
-            for j in range(i + 1, self.nb_vertex):
-                if self.adj_matrix[i, j] != inf:
-                    if weight:
-                        edges.append((i, j, self.adj_matrix[i, j]))
-                    else:
-                        edges.append((i, j))
+        index1, index2, weights = self._get_edge_arrays()
+        if weight:
+            return list(zip(index1.tolist(), index2.tolist(), weights.tolist()))
+        return list(zip(index1.tolist(), index2.tolist()))
+
+    def _get_edge_arrays(self):
+        """Get the edges (i, j) with i < j as three parallel arrays, sorted by i then j.
+
+        The arrays are extracted in bulk and cached until the graph is modified.
+
+        :return: The arrays of the first vertices, of the second vertices and of the weights.
+        :rtype: tuple of numpy.ndarray
+        """
+
+        if self._edges_cache is not None and self._edges_cache[0] == self._version:
+            return self._edges_cache[1]
+        if self.storage == "sparse":
+            index1, index2, weights = [], [], []
+            for i in range(self.nb_vertex):
+                for j in sorted(self._adj[i]):
+                    if j > i:
+                        index1.append(i)
+                        index2.append(j)
+                        weights.append(self._adj[i][j])
+            edges = (np.array(index1, dtype=np.intp), np.array(index2, dtype=np.intp), np.array(weights, dtype=np.float64))
+        elif self.storage == "packed":
+            position = np.flatnonzero(self._packed != self._no_edge)
+            # Invert `get_packed_index`, then fix the rounding of the square root.
+            index2 = ((1 + np.sqrt(1 + 8 * position.astype(np.float64))) // 2).astype(np.intp)
+            index2 -= get_packed_index(0, index2) > position
+            index2 += get_packed_index(0, index2 + 1) <= position
+            index1 = position - get_packed_index(0, index2)
+            order = np.lexsort((index2, index1))
+            edges = (index1[order], index2[order], self._from_raw(self._packed[position[order]]))
+        else:
+            index1, index2 = np.nonzero(np.triu(self.adj_matrix != self._no_edge, 1))
+            edges = (index1, index2, self._from_raw(self.adj_matrix[index1, index2]))
+        self._edges_cache = (self._version, edges)
         return edges
 
     def get_neighbors(self, vertex):
@@ -45,11 +284,45 @@ class Graph():
         :rtype: list
         """
 
-        neighbors = []
-        for i in range(self.nb_vertex):
-            if self.are_neighbors(vertex, i) and vertex != i:
-                neighbors.append(i)
-        return neighbors
+        if self.storage == "sparse":
+            return sorted(self._adj[vertex])
+        bits = np.unpackbits(self._neighbor_bits[vertex], count=self.nb_vertex, bitorder="little")
+        return np.flatnonzero(bits).tolist()
+
+    def _get_neighbor_lists(self):
+        """Get the sorted list of the neighbors of every vertex, cached until the graph is modified.
+
+        :return: A list containing the neighbors of every vertex.
+        :rtype: list of list
+        """
+
+        if self._neighbors_cache is None or self._neighbors_cache[0] != self._version:
+            if self.storage == "sparse":
+                neighbors = [sorted(adj) for adj in self._adj]
+            else:
+                neighbors = [np.flatnonzero(bits).tolist() for bits in self._unpack_neighbor_bits()]
+            self._neighbors_cache = (self._version, neighbors)
+        return self._neighbors_cache[1]
+
+    def _unpack_neighbor_bits(self):
+        """Get the neighbor bitmasks of the "dense" and "packed" storages as a boolean matrix."""
+
+        nb_vertex = self.nb_vertex
+        return np.unpackbits(self._neighbor_bits[:nb_vertex], axis=1, count=nb_vertex, bitorder="little").view(bool)
+
+    def _set_neighbor_bits(self, index1, index2, present):
+        """Set, or clear where `present` is False, the bits of the edges (index1, index2) in both bitmasks.
+
+        :param numpy.ndarray index1: The indices of the first vertices, without self-loops.
+        :param numpy.ndarray index2: The indices of the second vertices.
+        :param numpy.ndarray present: Whether each edge exists.
+        """
+
+        for rows, columns in ((index1, index2), (index2, index1)):
+            bits = np.left_shift(1, columns & 7).astype(np.uint8)
+            np.bitwise_or.at(self._neighbor_bits, (rows[present], columns[present] >> 3), bits[present])
+            absent = ~present
+            np.bitwise_and.at(self._neighbor_bits, (rows[absent], columns[absent] >> 3), ~bits[absent])
 
     def are_neighbors(self, vertex1, vertex2):
         """Check if `vertex1` and `vertex2` are neighbors.
@@ -60,7 +333,78 @@ class Graph():
         :rtype: bool
         """
 
-        return (self.adj_matrix[vertex1, vertex2], self.adj_matrix[vertex2, vertex1]) != (inf, inf)
+        if self.storage == "sparse":
+            return vertex2 in self._adj[vertex1]
+        if self.storage == "packed":
+            position = get_packed_index(min(vertex1, vertex2), max(vertex1, vertex2))
+            return vertex1 != vertex2 and self._packed[position] != self._no_edge
+        return (self.adj_matrix[vertex1, vertex2], self.adj_matrix[vertex2, vertex1]) != (self._no_edge, self._no_edge)
+
+    def get_weight(self, vertex1, vertex2):
+        """Get the weight of the edge between `vertex1` and `vertex2`.
+
+        :param int vertex1: the index of the first vertex.
+        :param int vertex2: the index of the second vertex.
+        :return: The weight of the edge, `inf` if there is no edge and 0 if `vertex1` is `vertex2`.
+        :rtype: float
+        """
+
+        if self.storage == "dense":
+            weight = self.adj_matrix[vertex1, vertex2]
+        elif vertex1 == vertex2:
+            return 0
+        elif self.storage == "sparse":
+            return self._adj[vertex1].get(vertex2, inf)
+        else:
+            weight = self._packed[get_packed_index(min(vertex1, vertex2), max(vertex1, vertex2))]
+        # The raw scalar of a compact dtype would overflow when added up.
+        return inf if weight == self._no_edge else float(weight)
+
+    def _get_row(self, vertex):
+        """Get the weights of the edges of `vertex` to every vertex as float64, `inf` meaning no edge.
+
+        With the float64 "dense" storage the row of the matrix is returned, otherwise a new array.
+        """
+
+        if self.storage == "dense":
+            return self._from_raw(self.adj_matrix[vertex])
+        row = np.full(self.nb_vertex, inf)
+        if self.storage == "sparse":
+            row[list(self._adj[vertex])] = list(self._adj[vertex].values())
+        else:
+            others = np.arange(self.nb_vertex)
+            others = others[others != vertex]
+            row[others] = self._from_raw(self._packed[get_packed_index(np.minimum(others, vertex),
+                                                                       np.maximum(others, vertex))])
+        row[vertex] = 0
+        return row
+
+    def get_adj_matrix(self):
+        """Get the adjacency matrix of the graph.
+
+        With the float64 "dense" storage the matrix of the graph is returned, otherwise
+        a new float64 matrix is built.
+
+        :return: The `nb_vertex` x `nb_vertex` adjacency matrix, `inf` meaning no edge.
+        :rtype: numpy.ndarray
+        """
+
+        nb_vertex = self.nb_vertex
+        if self.storage == "dense":
+            if self.dtype == np.float64:
+                return np.reshape(self.adj_matrix, (nb_vertex, nb_vertex))
+            return self._from_raw(self.adj_matrix)
+        adj_matrix = np.full((nb_vertex, nb_vertex), inf)
+        np.fill_diagonal(adj_matrix, 0)
+        if self.storage == "packed":
+            index1, index2, weights = self._get_edge_arrays()
+            adj_matrix[index1, index2] = weights
+            adj_matrix[index2, index1] = weights
+            return adj_matrix
+        for i in range(nb_vertex):
+            for j, weight in self._adj[i].items():
+                adj_matrix[i, j] = weight
+        return adj_matrix
 
     def rem_edge(self, edge):
         """Delete an edge from the graph
@@ -69,8 +413,22 @@ class Graph():
         """
 
         i, j = edge
-        self.adj_matrix[i, j] = inf
-        self.adj_matrix[j, i] = inf
+        version = self._version
+        old_weight = self.get_weight(i, j)
+        self._touch()
+        if self.storage == "sparse":
+            self._adj[i].pop(j, None)
+            self._adj[j].pop(i, None)
+        elif i != j:
+            if self.storage == "dense":
+                self.adj_matrix[i, j] = self._no_edge
+                self.adj_matrix[j, i] = self._no_edge
+            else:
+                self._packed[get_packed_index(min(i, j), max(i, j))] = self._no_edge
+            self._set_neighbor_bits(np.array([i]), np.array([j]), np.array([False]))
+        elif self.storage == "dense":
+            self.adj_matrix[i, j] = self._no_edge
+        self._repair_dist(version, i, j, old_weight, inf)
 
     def rem_edges(self, edges):
         """Delete multiple edges from the graph.
@@ -84,25 +442,65 @@ class Graph():
     def rem_all_edges(self):
         """Delete all the edges from the graph."""
 
-        dimension = self.nb_vertex
-        self.adj_matrix = np.ones((dimension, dimension)) * inf
+        version = self._version
+        nb_vertex = self.nb_vertex
+        self._touch()
+        if self.storage == "sparse":
+            self._adj = [{} for i in range(nb_vertex)]
+        else:
+            self._neighbor_bits.fill(0)
+            if self.storage == "dense":
+                self.adj_matrix.fill(self._no_edge)
+                np.fill_diagonal(self.adj_matrix, 0)
+            else:
+                self._packed.fill(self._no_edge)
+        if self._dist_version == version:
+            self.dist = np.full((nb_vertex, nb_vertex), inf, dtype=self.dist.dtype)
+            np.fill_diagonal(self.dist, 0)
+            self._dist_version = self._version
+            if self._next_hop_version == version:
+                self.next_hop = np.full((nb_vertex, nb_vertex), -1, dtype=np.int32)
+                np.fill_diagonal(self.next_hop, np.arange(nb_vertex))
+                self._next_hop_version = self._version
 
     def add_edge(self, edge, weight=1, by="index"):
         """Add an edge to the graph.
 
+        The self-loops are not stored in the adjacency lists, with the "dense" storage
+        they overwrite the diagonal of the matrix. The weight is converted to the dtype
+        of the matrix.
+
         :param iterable edge: An iterable representing the edge to be added.
         :param weight: The weight of the edge. (Default 1)
         :param str by: The method used to add edge. (Default "index")
         """
 
         if by == "index":
-            self.adj_matrix[edge[0], edge[1]] = weight
-            self.adj_matrix[edge[1], edge[0]] = weight
+            index1, index2 = edge[0], edge[1]
         elif by == "label":
-            index1 = self.label.index(edge[0])
-            index2 = self.label.index(edge[1])
+            index1 = self.get_index(edge[0])
+            index2 = self.get_index(edge[1])
+        else:
+            return None
+        if self.storage != "sparse" and self.dtype != np.float64:
+            weight = self._from_raw(self._to_raw(weight)).item()
+        version = self._version
+        old_weight = self.get_weight(index1, index2)
+        self._touch()
+        if self.storage == "sparse":
+            if index1 != index2:
+                self._adj[index1][index2] = weight
+                self._adj[index2][index1] = weight
+        elif index1 != index2:
+            if self.storage == "dense":
+                self.adj_matrix[index1, index2] = weight
+                self.adj_matrix[index2, index1] = weight
+            else:
+                self._packed[get_packed_index(min(index1, index2), max(index1, index2))] = weight
+            self._set_neighbor_bits(np.array([index1]), np.array([index2]), np.array([weight != inf]))
+        elif self.storage == "dense":
             self.adj_matrix[index1, index2] = weight
-            self.adj_matrix[index2, index1] = weight
+        self._repair_dist(version, index1, index2, old_weight, weight)
 
     def add_edges(self, edges, weights=None):
         """Add multiple edges to the graph.
@@ -115,24 +513,112 @@ class Graph():
             weights = [1] * len(edges)
         elif len(weights) != len(edges):
             raise ValueError("weights must be the same length as edges.")
-        for i in range(len(edges)):
-            self.add_edge(edges[i], weights[i])
+        self._set_edges([edge[0] for edge in edges], [edge[1] for edge in edges], weights)
 
-    def add_vertex(self, label=""):
-        """Add a vertex to the graph.
+    def _set_edges(self, index1, index2, weights):
+        """Add multiple edges given as parallel sequences of indices and weights.
 
-        :param str label: label for the vertex whose being added to the graph. (Default "")
+        With the "dense" and "packed" storages the matrix is filled with one vectorized assignment.
+        When an edge appears several times the last weight is kept, as with `add_edge`.
+        The cached distances are repaired when less edges than vertices only lower
+        weights between distinct vertices, and recomputed on demand otherwise.
+
+        :param iterable index1: The indices of the first vertex of the edges.
+        :param iterable index2: The indices of the second vertex of the edges.
+        :param iterable weights: The weights of the edges.
         """
 
-        if self.nb_vertex == 0:
-            self.adj_matrix = np.array([0])
-        elif self.nb_vertex == 1:
-            self.adj_matrix = np.array([[0, inf], [inf, 0]])
+        if len(weights) >= self.nb_vertex:
+            self._dist_version = None
+        if self.storage == "sparse":
+            for i, j, weight in zip(index1, index2, weights):
+                self.add_edge((i, j), weight)
+            return None
+        version = self._version
+        self._touch()
+        index1 = np.asarray(index1, dtype=np.intp)
+        index2 = np.asarray(index2, dtype=np.intp)
+        weights = np.asarray(weights, dtype=np.float64)
+        low = np.minimum(index1, index2)
+        high = np.maximum(index1, index2)
+        _, last = np.unique((low * self.nb_vertex + high)[::-1], return_index=True)
+        last = len(low) - 1 - last
+        low, high = low[last], high[last]
+        raw = self._to_raw(weights[last])
+        weights = self._from_raw(raw)
+        if self.storage == "dense":
+            old_weights = self._from_raw(self.adj_matrix[low, high])
+            self.adj_matrix[low, high] = raw
+            self.adj_matrix[high, low] = raw
         else:
-            self.adj_matrix = np.vstack((self.adj_matrix, np.ones(self.adj_matrix.shape[1]) * inf))
-            self.adj_matrix = np.column_stack((self.adj_matrix, np.ones(self.nb_vertex) * inf))
-            shape0, shape1 = self.adj_matrix.shape
-            self.adj_matrix[shape0 - 1, shape1 - 1] = 0
+            # The diagonal isn't stored, the self-loops are ignored.
+            edge = low != high
+            position = get_packed_index(low[edge], high[edge])
+            old_weights = np.zeros(len(low))
+            old_weights[edge] = self._from_raw(self._packed[position])
+            self._packed[position] = raw[edge]
+        edge = low != high
+        self._set_neighbor_bits(low[edge], high[edge], weights[edge] != inf)
+        if (old_weights < weights).any() or (low == high).any():
+            return None
+        for i, j, old_weight, weight in zip(low.tolist(), high.tolist(), old_weights.tolist(), weights.tolist()):
+            self._repair_dist(version, i, j, old_weight, weight)
+            version = self._version
+
+    def add_vertex(self, label=None):
+        """Add a vertex to the graph.
+
+        :param str label: label for the vertex whose being added to the graph. (Default None, its index)
+        """
+
+        self.add_vertices(1, [label])
+
+    def add_vertices(self, nb_vertex, labels=None):
+        """Add multiple vertices to the graph.
+
+        With the "dense" and "packed" storages the buffer capacity is doubled when it
+        is full, so adding n vertices costs O(n²) overall.
+
+        :param int nb_vertex: The number of vertices to add.
+        :param iterable labels: The labels of the new vertices. (Default None, their indices)
+        """
+
+        self._touch()
+        old_nb_vertex = self.nb_vertex
+        new_nb_vertex = old_nb_vertex + nb_vertex
+        if labels is None:
+            labels = [None] * nb_vertex
+        elif len(labels) != nb_vertex:
+            raise ValueError("labels must be the same length as the number of vertices.")
+        for i, label in zip(range(old_nb_vertex, new_nb_vertex), labels):
+            label = i if label is None else label
+            self.label.append(label)
+            self.label_index.setdefault(label, i)
+        self._nb_vertex = new_nb_vertex
+        if self.storage == "sparse":
+            self._adj.extend({} for i in range(nb_vertex))
+            return None
+        if new_nb_vertex > self._neighbor_bits.shape[0]:
+            capacity = max(2 * self._neighbor_bits.shape[0], new_nb_vertex)
+            old_bits = self._neighbor_bits
+            self._neighbor_bits = np.zeros((capacity, (capacity + 7) // 8), dtype=np.uint8)
+            self._neighbor_bits[:old_bits.shape[0], :old_bits.shape[1]] = old_bits
+        if self.storage == "packed":
+            size = get_packed_index(0, new_nb_vertex)
+            if size > len(self._buffer):
+                old_packed = self._packed
+                self._buffer = np.full(max(2 * len(self._buffer), size), self._no_edge, dtype=self.dtype)
+                self._buffer[:len(old_packed)] = old_packed
+            self._packed = self._buffer[:size]
+            return None
+        capacity = self._buffer.shape[0]
+        if new_nb_vertex > capacity:
+            capacity = max(2 * capacity, new_nb_vertex)
+            old_matrix = self.adj_matrix
+            self._buffer = np.full((capacity, capacity), self._no_edge, dtype=self.dtype)
+            np.fill_diagonal(self._buffer, 0)
+            self._buffer[:old_nb_vertex, :old_nb_vertex] = old_matrix
+        self.adj_matrix = self._buffer[:new_nb_vertex, :new_nb_vertex]
 
     def set_label_vertex(self, vertex, label):
         """Set the label of a vertex.
@@ -143,28 +629,61 @@ class Graph():
 
         if vertex >= len(self.label):
             raise ValueError("`vertex` doesn't exist in the current graph.")
+        if self.label_index.get(self.label[vertex]) == vertex:
+            del self.label_index[self.label[vertex]]
         self.label[vertex] = label
+        self.label_index.setdefault(label, vertex)
+
+    def get_index(self, label):
+        """Get the index of the vertex labeled `label`.
+
+        :param label: The label of the vertex.
+        :return: The index of the vertex.
+        :rtype: int
+        """
+
+        try:
+            return self.label_index[label]
+        except KeyError:
+            raise ValueError(f"`{label}` is not a label of the graph.") from None
 
     def _import_from_file_specific_index(self, lines):
         index = 1
-        if "INDEX" in lines[0]:
-            while not (lines[index].rstrip("\n").isspace() or lines[index] == "\n"):
-                self.add_vertex()
-                self.label.append(lines[index].rstrip("\n"))
-                index += 1
-        index += 1
-        for line in lines[index:]:
-            line = line.split(",")
-            self.add_edge(line[:2], weight=int(line[2].strip("\n")), by="label")
+        labels = []
+        while not (lines[index].rstrip("\n").isspace() or lines[index] == "\n"):
+            labels.append(lines[index].rstrip("\n"))
+            index += 1
+        self.add_vertices(len(labels), labels)
+        self._import_edges(lines[index + 1:], new_label=False)
 
     def _import_from_file(self, lines):
+        self._import_edges(lines, new_label=True)
+
+    def _import_edges(self, lines, new_label):
+        """Parse the edge lines `label1,label2,weight` in one pass and add the edges in bulk.
+
+        :param iterable lines: The lines describing the edges, blank lines are skipped.
+        :param bool new_label: Add a vertex for the unknown labels if True, raise a ValueError otherwise.
+        """
+
+        label_index = self.label_index
+        new_labels = []
+        index1, index2, weights = [], [], []
         for line in lines:
-            line = line.split(",")
-            for label in line[:2]:
-                if label not in self.label:
-                    self.add_vertex()
-                    self.label.append(label)
-            self.add_edge(line[:2], weight=int(line[2].strip("\n")), by="label")
+            fields = line.split(",")
+            if len(fields) < 3:
+                continue
+            for label in fields[:2]:
+                if label not in label_index:
+                    if not new_label:
+                        raise ValueError(f"`{label}` is not a label of the graph.")
+                    label_index[label] = len(self.label) + len(new_labels)
+                    new_labels.append(label)
+            index1.append(label_index[fields[0]])
+            index2.append(label_index[fields[1]])
+            weights.append(int(fields[2]))
+        self.add_vertices(len(new_labels), new_labels)
+        self._set_edges(index1, index2, weights)
 
     def import_from_file(self, filename):
         """Import a graph from a file. (!! Doesn't support same label for two different vertices. !!)
@@ -172,14 +691,147 @@ class Graph():
         :param str filename: the name of the file containing the graph data.
         """
 
-        self.adj_matrix = np.array([])
+        self._touch()
+        self._init_storage(0)
         self.label.clear()
+        self.label_index.clear()
         with open(filename, "r") as file:
             lines = file.readlines()
             if lines[0].rstrip("\n") == "INDEX":
                 self._import_from_file_specific_index(lines)
             else:
                 self._import_from_file(lines)
+        content_hash = hashlib.sha256("".join(lines).encode("utf-8")).hexdigest()
+        self._source = (f"{content_hash}-{self.storage}-{self.dtype.name}-v{DISK_CACHE_VERSION}", self._version)
+
+    def _get_disk_key(self, name):
+        """Return the disk cache key of the matrix `name`, None if the graph changed since its import."""
+
+        if self.disk_cache is None or self._source is None or self._source[1] != self._version:
+            return None
+        return f"{self._source[0]}-{name}"
+
+    def _read_dist(self, dtype, next_hop):
+        """Read the distance matrix, and the next-hop matrix if asked, from the disk cache.
+
+        :return: True if the matrices were found, False otherwise.
+        :rtype: bool
+        """
+
+        dist_key = self._get_disk_key(f"dist-{np.dtype(dtype).name}")
+        if dist_key is None:
+            return False
+        dist = self.disk_cache.get(dist_key)
+        hops = self.disk_cache.get(self._get_disk_key("next_hop")) if next_hop else None
+        if dist is None or (next_hop and hops is None):
+            return False
+        self.dist = dist
+        self._dist_version = self._version
+        if next_hop:
+            self.next_hop = hops
+            self._next_hop_version = self._version
+        return True
+
+    def _write_dist(self, next_hop):
+        """Store the distance matrix, and the next-hop matrix if asked, in the disk cache."""
+
+        dist_key = self._get_disk_key(f"dist-{self.dist.dtype.name}")
+        if dist_key is None:
+            return None
+        self.disk_cache.put(dist_key, self.dist)
+        if next_hop:
+            self.disk_cache.put(self._get_disk_key("next_hop"), self.next_hop)
+
+    def save(self, filename, dist=False):
+        """Save the graph in a binary file that `load` can memory-map.
+
+        :param str filename: The name of the file.
+        :param bool dist: Save the matrix of the minimal distances alongside the graph if True. (Default False)
+        """
+
+        nb_vertex = self.nb_vertex
+        labels = json.dumps(self.label).encode("utf-8")
+        header = np.zeros(1, dtype=BINARY_HEADER)
+        header["magic"] = BINARY_MAGIC
+        header["version"] = BINARY_VERSION
+        storage_flag = {"dense": 0, "sparse": FLAG_SPARSE, "packed": FLAG_PACKED}[self.storage]
+        header["flags"] = storage_flag | (FLAG_DIST if dist else 0)
+        header["nb_vertex"] = nb_vertex
+        header["labels_size"] = len(labels)
+        if self.storage != "dense":
+            index1, index2, weights = self._get_edge_arrays()
+            header["nb_edge"] = len(index1)
+            arrays = [index1.astype("<i8"), index2.astype("<i8"), weights.astype("<f8")]
+        else:
+            arrays = [np.ascontiguousarray(self.get_adj_matrix(), dtype="<f8")]
+        if dist:
+            arrays.append(np.ascontiguousarray(self.floydWarshall(), dtype="<f8"))
+        with open(filename, "wb") as file:
+            file.write(header.tobytes())
+            file.write(labels)
+            for array in arrays:
+                file.write(b"\0" * (-file.tell() % BINARY_ALIGNMENT))
+                file.write(array.tobytes())
+
+    def load(self, filename, mmap_mode="c"):
+        """Load a graph saved with `save`.
+
+        The arrays are memory-mapped, so opening a dense graph doesn't copy the matrix.
+        With the default copy-on-write mode the graph can still be modified, the file is never written.
+        The weights are saved as float64, so the loaded graph has the float64 dtype.
+
+        :param str filename: The name of the file.
+        :param str mmap_mode: The `numpy.memmap` mode, or None to read the arrays in memory. (Default "c")
+        """
+
+        header = np.fromfile(filename, dtype=BINARY_HEADER, count=1)
+        if len(header) == 0 or header["magic"][0] != BINARY_MAGIC:
+            raise ValueError(f"`{filename}` is not a binary graph file.")
+        if header["version"][0] != BINARY_VERSION:
+            raise ValueError(f"Unsupported binary graph version {header['version'][0]}.")
+        flags = int(header["flags"][0])
+        nb_vertex = int(header["nb_vertex"][0])
+        nb_edge = int(header["nb_edge"][0])
+        labels_size = int(header["labels_size"][0])
+        with open(filename, "rb") as file:
+            file.seek(BINARY_HEADER.itemsize)
+            labels = json.loads(file.read(labels_size).decode("utf-8"))
+        offset = BINARY_HEADER.itemsize + labels_size
+
+        def read_array(dtype, shape):
+            nonlocal offset
+            offset += -offset % BINARY_ALIGNMENT
+            if mmap_mode is None or np.prod(shape) == 0:
+                array = np.fromfile(filename, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+            else:
+                array = np.memmap(filename, dtype=dtype, mode=mmap_mode, offset=offset, shape=shape)
+            offset += np.dtype(dtype).itemsize * int(np.prod(shape))
+            return array
+
+        self._touch()
+        self.storage = "sparse" if flags & FLAG_SPARSE else "packed" if flags & FLAG_PACKED else "dense"
+        self._set_dtype(np.float64)
+        self.label = labels
+        self.label_index = {}
+        for i, label in enumerate(labels):
+            self.label_index.setdefault(label, i)
+        if self.storage != "dense":
+            self._init_storage(nb_vertex)
+            index1 = read_array("<i8", (nb_edge,))
+            index2 = read_array("<i8", (nb_edge,))
+            weights = read_array("<f8", (nb_edge,))
+            self._set_edges(index1.tolist(), index2.tolist(), weights.tolist())
+        else:
+            self._buffer = read_array("<f8", (nb_vertex, nb_vertex))
+            self.adj_matrix = self._buffer
+            self._nb_vertex = nb_vertex
+            self._adj = None
+            neighbors = self.adj_matrix != self._no_edge
+            np.fill_diagonal(neighbors, False)
+            self._neighbor_bits = np.packbits(neighbors, axis=1, bitorder="little")
+        if flags & FLAG_DIST:
+            self.dist = read_array("<f8", (nb_vertex, nb_vertex))
+            self._dist_version = self._version
 
     def plot(self, label_as_index=False, position=None, filepos=None):
         """Plot the graph in a matplotlib graph.
@@ -215,63 +867,412 @@ class Graph():
         :rtype: tuple
         """
 
-        spanning_tree_edges, weight = self._kruskal()
+        return self.minimum_spanning_tree("kruskal", inplace)
+
+    def minimum_spanning_tree(self, method="auto", inplace=False):
+        """Compute a minimum spanning tree of the graph, a forest if it is disconnected.
+
+        Kruskal and Borůvka algorithms work on the edge arrays, Prim algorithm on the
+        adjacency matrix. By default Prim algorithm is used for dense graphs and Kruskal
+        algorithm otherwise, see `get_spanning_tree_method`.
+
+        :param str method: The algorithm used, "kruskal", "prim", "boruvka" or "auto". (Default "auto")
+        :param bool inplace: Remove the edge not in the spanning tree if True. (Default False)
+        :return: The edges (i, j, weight) of the spanning tree and the total weight of the tree.
+        :rtype: tuple
+        """
+
+        spanning_tree_edges, weight = self._get_spanning_tree(method)
         if inplace:
             self.rem_all_edges()
             for edge in spanning_tree_edges:
                 self.add_edge(edge[:2], edge[2])
         return spanning_tree_edges, weight
 
-    def _kruskal(self):
-        """Apply Kruskal algorithm to the graph.
+    def get_spanning_forest(self):
+        """Get a minimum spanning forest of the graph that can be updated as edges are inserted.
 
-        :return: The edges of the spanning tree and the total weight of the tree.
-        :rtype: tuple
+        :return: An `IncrementalSpanningForest` initialized with the minimum spanning tree of the graph.
+        :rtype: IncrementalSpanningForest
         """
 
-        disjoint_set = UnionFind()
-        s = set()
-        for i in range(self.nb_vertex):
-            disjoint_set.make_set(i)
-        edges = self.get_edges()
-        edges = sorted(edges, key=lambda e: e[2])
-        for edge in edges:
-            root1 = disjoint_set.find(edge[0])
-            root2 = disjoint_set.find(edge[1])
-            if  root1 != root2:
-                s.add(edge)
-                disjoint_set.union(root1, root2)
-        return s, sum([e[2] for e in s])
-
-    def floydWarshall(self):
+        spanning_tree_edges, weight = self.minimum_spanning_tree()
+        return IncrementalSpanningForest(self.nb_vertex, sorted(spanning_tree_edges))
+
+    @memoize
+    def _get_spanning_tree(self, method):
+        if method == "auto":
+            method = get_spanning_tree_method(self.nb_vertex, self.nb_edge)
+        if method == "prim":
+            index1, index2, weights = prim(self.nb_vertex, self._get_row)
+        elif method in ("kruskal", "boruvka"):
+            index1, index2, weights = self._get_edge_arrays()
+            if method == "kruskal":
+                accepted = kruskal(self.nb_vertex, index1, index2, weights)
+            else:
+                accepted = boruvka(self.nb_vertex, index1, index2, weights)
+            index1, index2, weights = index1[accepted], index2[accepted], weights[accepted]
+        else:
+            raise ValueError(f"Unknown method `{method}`.")
+        return set(zip(index1.tolist(), index2.tolist(), weights.tolist())), weights.sum().item()
+
+    def floydWarshall(self, dtype=np.float64, next_hop=False):
         """Return the minimal distances between every vertex.
-        :param matrix: Matrix of adjacency of a graph.
-        :return: Matrix of minimal distances between every vertex.
+
+        The matrix is relaxed with one broadcast min-plus update per pivot `k`
+        instead of a scalar triple loop. With `next_hop` the same pass records in
+        `self.next_hop[i, j]` the vertex following `i` on a shortest path to `j`
+        (-1 if unreachable), used by `path` and `paths`. The matrices are only
+        computed again after the edges change, and read from the disk cache when
+        the graph was just imported from a known file.
+
+        :param dtype: The floating dtype used to compute the distances. (Default numpy.float64)
+        :param bool next_hop: Compute the next-hop matrix as well if True. (Default False)
+        :return: Read-only view of the matrix of minimal distances between every vertex.
+        :rtype: numpy.ndarray
+        """
+
+        if not np.issubdtype(np.dtype(dtype), np.floating):
+            raise ValueError("`dtype` must be a floating dtype, unreachable vertices are stored as `inf`.")
+        if (self._dist_version == self._version and self.dist.dtype == dtype
+                and (not next_hop or self._next_hop_version == self._version)):
+            return self._get_dist_view()
+        if self._read_dist(dtype, next_hop):
+            return self._get_dist_view()
+        nb_vertex = self.nb_vertex
+        self.dist = np.array(self.get_adj_matrix(), dtype=dtype)
+        if not next_hop:
+            for k in range(nb_vertex):
+                np.minimum(self.dist, self.dist[:, k, np.newaxis] + self.dist[k], out=self.dist)
+            self._dist_version = self._version
+            self._write_dist(False)
+            return self._get_dist_view()
+        hops = np.where(np.isfinite(self.dist), np.arange(nb_vertex, dtype=np.int32), np.int32(-1))
+        for k in range(nb_vertex):
+            candidate = self.dist[:, k, np.newaxis] + self.dist[k]
+            improved = candidate < self.dist
+            np.copyto(self.dist, candidate, where=improved)
+            np.copyto(hops, hops[:, k, np.newaxis].copy(), where=improved)
+        self.next_hop = hops
+        self._dist_version = self._next_hop_version = self._version
+        self._write_dist(True)
+        return self._get_dist_view()
+
+    def _get_dist_view(self):
+        """Return a read-only view of `self.dist`.
+
+        The matrix is kept and repaired in place after the graph changes, and can be a
+        memory map of the disk cache, so the callers must not write into it.
+        """
+
+        view = self.dist.view()
+        view.flags.writeable = False
+        return view
+
+    def _repair_dist(self, version, index1, index2, old_weight, new_weight):
+        """Update the distances cached at `version` after the weight of an edge changed.
+
+        A lower weight is relaxed through the edge in O(n²), along with the next-hop
+        matrix. A higher weight, or a removed edge, recomputes with Dijkstra algorithm the
+        rows of the vertices whose shortest paths used the edge, and drops the next hops.
+        The cache stays invalid when it can't be repaired.
+
+        :param int version: The version of the graph before the change.
+        :param int index1: The index of the first vertex of the edge.
+        :param int index2: The index of the second vertex of the edge.
+        :param old_weight: The previous weight of the edge, `inf` if it was added.
+        :param new_weight: The new weight of the edge, `inf` if it was removed.
+        """
+
+        if self._dist_version != version or index1 == index2:
+            return None
+        # The self-loops stored on the diagonal of a dense matrix and the negative cycles
+        # break the zero distances from a vertex to itself used below.
+        if np.diagonal(self.dist).any() or (self.storage == "dense" and np.diagonal(self.adj_matrix).any()):
+            return None
+        next_hop = self._next_hop_version == version
+        dist = self.dist
+        if new_weight < old_weight:
+            if new_weight < 0:
+                return None
+            # Paths i -> index1 -> index2 -> j and i -> index2 -> index1 -> j.
+            via1 = dist[:, index1, np.newaxis] + new_weight + dist[index2]
+            via2 = dist[:, index2, np.newaxis] + new_weight + dist[index1]
+            if next_hop:
+                hop1 = self.next_hop[:, index1].copy()
+                hop1[index1] = index2
+                hop2 = self.next_hop[:, index2].copy()
+                hop2[index2] = index1
+                for via, hop in ((via1, hop1), (via2, hop2)):
+                    improved = via < dist
+                    np.copyto(dist, via, where=improved)
+                    np.copyto(self.next_hop, hop[:, np.newaxis], where=improved)
+            else:
+                np.minimum(dist, via1, out=dist)
+                np.minimum(dist, via2, out=dist)
+        elif new_weight > old_weight:
+            next_hop = False
+            # Tolerance for the rounding of floating weights, a false positive only costs a row.
+            tolerance = 1e-9 * np.maximum(1, np.abs(dist))
+            with np.errstate(invalid="ignore"):
+                via = dist[:, index1, np.newaxis] + old_weight + dist[index2]
+                used = (via - dist <= tolerance) | (via.T - dist <= tolerance)
+            rows = np.flatnonzero(used.any(axis=1))
+            if len(rows) > 0:
+                try:
+                    neighbors = self._get_weighted_neighbors()
+                except ValueError:
+                    return None
+                for row in rows.tolist():
+                    dist[row] = dijkstra(neighbors, row)
+                    dist[:, row] = dist[row]
+        self._dist_version = self._version
+        if next_hop:
+            self._next_hop_version = self._version
+
+    def _get_next_hop(self):
+        """Return the next-hop matrix, computed once per version of the graph."""
+
+        if self._next_hop_version != self._version:
+            self.floydWarshall(next_hop=True)
+        return self.next_hop
+
+    def path(self, source, target):
+        """Return a shortest path from `source` to `target` using the next-hop matrix.
+
+        The matrix is computed by `floydWarshall` on the first call after a change of
+        the edges, then every path is rebuilt in O(length of the path).
+
+        :param int source: The index of the first vertex.
+        :param int target: The index of the last vertex.
+        :return: The indices of the vertices of the path, None if `target` is unreachable.
+        :rtype: list or None
+        """
+
+        next_hop = self._get_next_hop()
+        if next_hop[source, target] < 0:
+            return None
+        path = [source]
+        while path[-1] != target:
+            path.append(int(next_hop[path[-1], target]))
+        return path
+
+    def paths(self, pairs):
+        """Return a shortest path for every (source, target) pair, see `path`.
+
+        The paths are extended together, one vectorized step per vertex of the longest one.
+
+        :param iterable pairs: The (source, target) pairs of indices.
+        :return: For every pair, the indices of the vertices of the path, None if unreachable.
+        :rtype: list
+        """
+
+        next_hop = self._get_next_hop()
+        pairs = np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+        sources, targets = pairs[:, 0], pairs[:, 1]
+        reachable = next_hop[sources, targets] >= 0
+        current = sources.copy()
+        paths = [[source] for source in sources.tolist()]
+        active = np.flatnonzero(reachable & (sources != targets))
+        while active.size > 0:
+            current[active] = next_hop[current[active], targets[active]]
+            for i, vertex in zip(active.tolist(), current[active].tolist()):
+                paths[i].append(vertex)
+            active = active[current[active] != targets[active]]
+        return [path if is_reachable else None for path, is_reachable in zip(paths, reachable.tolist())]
+
+    def dijkstra(self, source):
+        """Return the minimal distances from `source` to every vertex with Dijkstra algorithm.
+
+        :param int source: The index of the source vertex.
+        :return: Array of the minimal distances from `source`, `inf` if unreachable.
+        :rtype: numpy.ndarray
+        """
+
+        return np.array(dijkstra(self._get_weighted_neighbors(), source))
+
+    def all_pairs_dijkstra(self, processes=None):
+        """Return the minimal distances between every vertex by running Dijkstra from every vertex.
+
+        Produces the same matrix as `floydWarshall` in O(n·m·log(n)), which is faster on sparse graphs.
+
+        :param int processes: The number of worker processes running the sources. (Default None,
+            a process per CPU on large sparse graphs and no pool otherwise)
+        :return: Read-only view of the matrix of minimal distances between every vertex.
+        :rtype: numpy.ndarray
+        """
+
+        if self._dist_version == self._version and self.dist.dtype == np.float64:
+            return self._get_dist_view()
+        if self._read_dist(np.float64, False):
+            return self._get_dist_view()
+        neighbors = self._get_weighted_neighbors()
+        processes = get_nb_processes(self.nb_vertex, self.nb_edge, processes)
+        self.dist = all_pairs_dijkstra(neighbors, processes)
+        self._dist_version = self._version
+        self._write_dist(False)
+        return self._get_dist_view()
+
+    def get_dist(self):
+        """Return the minimal distances between every vertex, computed once per version of the graph.
+
+        The matrix computed by the last call to `floydWarshall` or `all_pairs_dijkstra`
+        is reused, and repaired incrementally when edges are added, removed or reweighted.
+
+        :return: Read-only view of the matrix of minimal distances between every vertex.
+        :rtype: numpy.ndarray
         """
 
-        self.dist = copy(self.adj_matrix)
-        for k in range(len(self.adj_matrix)):
-            for i in range(len(self.adj_matrix)):
-                for j in range(len(self.adj_matrix)):
-                    self.dist[i][j] = min(self.dist[i][j], self.dist[i][k] + self.dist[k][j])
-        return self.dist
+        if self._dist_version != self._version:
+            self.floydWarshall()
+        return self._get_dist_view()
+
+    @memoize
+    def plan_route(self, rooms, start=None, end=None):
+        """Compute the shortest route visiting every vertex of `rooms`, in any order.
+
+        The route may go through other vertices. Held-Karp runs on the metric closure of
+        `rooms`, taken from `get_dist`, so that the all-pairs distances are only computed
+        once for many queries. The order found is then expanded into the shortest paths
+        between the consecutive rooms, with `paths` when the next-hop matrix is up to
+        date. Otherwise, since the repairs of the distances and `all_pairs_dijkstra` don't
+        keep the next hops, every leg is walked back along the distances with `dist_path`,
+        and searched with Dijkstra algorithm in the rare cases where the walk gives up.
+
+        :param iterable rooms: The indices of the vertices to visit.
+        :param int start: The index of the first vertex of the route. (Default None, any vertex of `rooms`)
+        :param int end: The index of the last vertex of the route, different from `start`.
+            (Default None, any vertex of `rooms`)
+        :return: The route as a list of indices and its weight if the vertices are
+            connected, None otherwise.
+        :rtype: tuple or None
+        """
+
+        dist = self.get_dist()
+        terminals = list(dict.fromkeys(([] if start is None else [start]) + list(rooms)
+                                       + ([] if end is None else [end])))
+        nb_terminal = len(terminals)
+        starting_vertex = range(nb_terminal) if start is None else [0]
+        ending_vertex = range(nb_terminal) if end is None else [terminals.index(end)]
+        result = held_karp(dist[np.ix_(terminals, terminals)], starting_vertex, ending_vertex)
+        if result is None:
+            return None
+        order, weight = result
+        route = [terminals[order[0]]]
+        legs = [(terminals[order[i]], terminals[order[i + 1]]) for i in range(len(order) - 1)]
+        if self._next_hop_version == self._version:
+            legs = self.paths(legs)
+        else:
+            neighbors = self._get_weighted_neighbors()
+            legs = [dist_path(neighbors, dist[source], source, target) or dijkstra_path(neighbors, source, target)
+                    for source, target in legs]
+        for leg in legs:
+            route.extend(leg[1:])
+        return route, weight
+
+    def _get_weighted_neighbors(self):
+        """Get, for every vertex, the list of its (neighbor, weight) tuples.
+
+        Dijkstra algorithm requires non-negative weights, so does every shortest path in an
+        undirected graph: a negative edge is a negative cycle. The lists are cached until
+        the graph is modified, the callers must not change them.
+        """
+
+        if self._weighted_neighbors_cache is not None and self._weighted_neighbors_cache[0] == self._version:
+            return self._weighted_neighbors_cache[1]
+        if self.storage == "sparse":
+            neighbors = [list(adj.items()) for adj in self._adj]
+        else:
+            # The neighbors sorted by vertex then neighbor, split at the first neighbor of every vertex.
+            index1, index2 = np.nonzero(self._unpack_neighbor_bits())
+            splits = np.searchsorted(index1, np.arange(self.nb_vertex + 1)).tolist()
+            index2, weights = index2.tolist(), self._get_weights(index1, index2).tolist()
+            neighbors = [list(zip(index2[splits[i]:splits[i + 1]], weights[splits[i]:splits[i + 1]]))
+                         for i in range(self.nb_vertex)]
+        if any(weight < 0 for adj in neighbors for _, weight in adj):
+            raise ValueError("Dijkstra algorithm doesn't support negative weights.")
+        self._weighted_neighbors_cache = (self._version, neighbors)
+        return neighbors
 
     def get_shortest_path(self, paths):
         """Get the shortest path between multiple path.
 
-        :param iterable paths: An iterable containing the paths.
-        :return: The shortest path in `paths`.
-        :rtype: iterable
+        The weights are computed with `get_path_weights`, one batch per length of path.
+        The first of the shortest paths is returned on ties.
+
+        :param iterable paths: An iterable containing the paths, or a m x L array.
+        :return: The shortest path in `paths` and its weight.
+        :rtype: tuple
+        """
+
+        if isinstance(paths, np.ndarray):
+            weights = self.get_path_weights(paths)
+        else:
+            by_length = {}
+            for i, path in enumerate(paths):
+                by_length.setdefault(len(path), []).append(i)
+            weights = np.empty(len(paths))
+            for indices in by_length.values():
+                weights[indices] = self.get_path_weights([paths[i] for i in indices])
+        best = int(np.argmin(weights))
+        return paths[best], weights[best].item()
+
+    def get_path_weights(self, paths):
+        """Compute the weights of many paths of the same length at once.
+
+        The weights of the hops are gathered from the storage with one vectorized lookup
+        per chunk of `PATH_WEIGHT_CHUNK` hops, see `_get_weights`, then added hop by hop
+        in the order of `get_path_weight`, so that both give the same weights.
+
+        :param paths: The m x L array of the vertices of the m paths.
+        :return: The weights of the paths, `inf` for the paths using a missing edge.
+        :rtype: numpy.ndarray
         """
 
-        best_path = paths[0]
-        best_weight = self.get_path_weight(paths[0])
-        for path in paths[1:]:
-            weight = self.get_path_weight(path)
-            if weight < best_weight:
-                best_weight = weight
-                best_path = path
-        return best_path, best_weight
+        paths = np.asarray(paths, dtype=np.intp)
+        if paths.ndim != 2:
+            raise ValueError("paths must be a m x L array, use `get_path_weight` for a single path.")
+        weights = np.zeros(len(paths))
+        chunk_size = max(1, PATH_WEIGHT_CHUNK // max(1, paths.shape[1]))
+        for start in range(0, len(paths), chunk_size):
+            chunk = paths[start:start + chunk_size]
+            hops = self._get_weights(chunk[:, :-1], chunk[:, 1:])
+            chunk_weights = weights[start:start + chunk_size]
+            for hop in hops.T:
+                chunk_weights += hop
+        return weights
+
+    def _get_weights(self, index1, index2):
+        """Get the weights of many vertex pairs at once, as `get_weight` does for one pair.
+
+        The weights are gathered from the matrix of the "dense" and "packed" storages, and
+        searched in the sorted edge arrays of the "sparse" storage, so no matrix is built.
+
+        :param numpy.ndarray index1: The indices of the first vertices.
+        :param numpy.ndarray index2: The indices of the second vertices, same shape.
+        :return: The float64 weights, `inf` if there is no edge and 0 between a vertex and itself.
+        :rtype: numpy.ndarray
+        """
+
+        if self.storage == "dense":
+            return self._from_raw(self.adj_matrix[index1, index2])
+        low = np.minimum(index1, index2)
+        high = np.maximum(index1, index2)
+        edge = low != high
+        weights = np.zeros(low.shape)
+        if self.storage == "packed":
+            weights[edge] = self._from_raw(self._packed[get_packed_index(low[edge], high[edge])])
+            return weights
+        weights[edge] = inf
+        edge_index1, edge_index2, edge_weights = self._get_edge_arrays()
+        if len(edge_weights) == 0:
+            return weights
+        # The edges are sorted by i then j, so are their keys i * n + j.
+        keys = edge_index1 * self.nb_vertex + edge_index2
+        queries = low[edge] * self.nb_vertex + high[edge]
+        position = np.minimum(np.searchsorted(keys, queries), len(keys) - 1)
+        weights[edge] = np.where(keys[position] == queries, edge_weights[position], inf)
+        return weights
 
     def get_path_weight(self, path):
         """Compute the weight of `path`.
@@ -283,7 +1284,7 @@ class Graph():
 
         weight = 0
         for i in range(len(path) - 1):
-            weight += self.adj_matrix[path[i], path[i + 1]]
+            weight += self.get_weight(path[i], path[i + 1])
         return weight
 
     def get_shortest_path_all_hamilton_path(self):
@@ -297,14 +1298,109 @@ class Graph():
 
         return self.get_shortest_hamilton_path(range(self.nb_vertex), range(self.nb_vertex))
 
-    def get_shortest_hamilton_path(self, starting_vertex=None, ending_vertex=None):
-        """Compute the shortest hamilton path such a path exists."""
+    def get_shortest_hamilton_path(self, starting_vertex=None, ending_vertex=None, method="backtrack", processes=1,
+                                   time_budget=1.0, seed=None):
+        """Compute the shortest hamilton path such a path exists.
+
+        The "heuristic" method only returns the best path found within `time_budget`,
+        see `approximate_hamilton_path`. Its random answer isn't memoized, so asking
+        again searches again, the exact methods are.
+
+        :param iterable starting_vertex: An iterable containing the starting vertices. (Default None, every vertex)
+        :param iterable ending_vertex: An iterable containing the ending vertices. (Default None, every vertex)
+        :param str method: The algorithm used, "backtrack", "branch_and_bound", "held_karp" or "heuristic". (Default "backtrack")
+        :param int processes: The number of worker processes of the "backtrack", "branch_and_bound" and
+            "heuristic" methods, None for one per CPU. (Default 1, no process pool)
+        :param float time_budget: The time budget in seconds of the "heuristic" method. (Default 1.0)
+        :param int seed: The seed of the random restarts of the "heuristic" method. (Default None)
+        :return: The shortest path and its weight if such a path exists, None otherwise.
+        :rtype: tuple or None
+        """
 
-        all_path = self.get_hamilton_path(starting_vertex, ending_vertex)
+        if starting_vertex is None:
+            starting_vertex = range(self.nb_vertex)
+        if ending_vertex is None:
+            ending_vertex = range(self.nb_vertex)
+        if method == "heuristic":
+            result = self.approximate_hamilton_path(starting_vertex, ending_vertex, time_budget, processes, seed)
+            return None if result is None else result[:2]
+        return self._get_shortest_hamilton_path(starting_vertex, ending_vertex, method, processes)
+
+    @memoize
+    def _get_shortest_hamilton_path(self, starting_vertex, ending_vertex, method, processes):
+        """Compute the shortest hamilton path with an exact method, see `get_shortest_hamilton_path`."""
+
+        if method == "held_karp":
+            return self.held_karp(starting_vertex, ending_vertex)
+        elif method == "branch_and_bound":
+            if processes == 1:
+                best_path = None
+                for best_path in self.iter_hamilton_path(starting_vertex, ending_vertex, best_only=True):
+                    pass
+            else:
+                best_path = next(iter(self._parallel_hamilton(starting_vertex, ending_vertex, True, processes)), None)
+            if best_path is None:
+                return None
+            return best_path, self.get_path_weight(best_path)
+        elif method != "backtrack":
+            raise ValueError(f"Unknown method `{method}`.")
+        all_path = self.get_hamilton_path(starting_vertex, ending_vertex, processes)
         if not all_path:
             return None
         return self.get_shortest_path(all_path)
 
+    def approximate_hamilton_path(self, starting_vertex=None, ending_vertex=None, time_budget=1.0, processes=1, seed=None):
+        """Search a short hamilton path within a wall-clock time budget.
+
+        Random restarts of nearest neighbor or spanning tree paths improved with 2-opt and
+        Or-opt moves, for graphs too large for the exact methods. A Hamilton path is a
+        spanning tree, so the weight of the minimum spanning tree bounds the optimum from
+        below and gives the gap estimate.
+
+        :param iterable starting_vertex: An iterable containing the starting vertices. (Default None, every vertex)
+        :param iterable ending_vertex: An iterable containing the ending vertices. (Default None, every vertex)
+        :param float time_budget: The time budget in seconds. (Default 1.0)
+        :param int processes: The number of worker processes running restarts, None for one per CPU. (Default 1)
+        :param int seed: The seed of the random restarts. (Default None)
+        :return: The best path found, its weight and its relative gap to the lower bound
+            if a Hamilton path was found, None otherwise.
+        :rtype: tuple or None
+        """
+
+        nb_vertex = self.nb_vertex
+        if starting_vertex is None:
+            starting_vertex = range(nb_vertex)
+        if ending_vertex is None:
+            ending_vertex = range(nb_vertex)
+        tree_edges, tree_weight = self.minimum_spanning_tree()
+        result = anytime_hamilton(self.get_adj_matrix(), starting_vertex, ending_vertex, tree_edges,
+                                  time_budget, processes, seed)
+        if result is None:
+            return None
+        path, weight = result
+        gap = (weight - tree_weight) / tree_weight if tree_weight > 0 else 0.0
+        return path, weight, gap
+
+    @memoize
+    def held_karp(self, starting_vertex=None, ending_vertex=None):
+        """Compute the shortest hamilton path with the Held-Karp dynamic programming algorithm.
+
+        Runs in O(2^n·n²) time and O(2^n·n) memory instead of enumerating every path.
+
+        :param iterable starting_vertex: An iterable containing the starting vertices. (Default None, every vertex)
+        :param iterable ending_vertex: An iterable containing the ending vertices. (Default None, every vertex)
+        :return: The shortest path and its weight if such a path exists, None otherwise.
+        :rtype: tuple or None
+        """
+
+        nb_vertex = self.nb_vertex
+        if starting_vertex is None:
+            starting_vertex = range(nb_vertex)
+        if ending_vertex is None:
+            ending_vertex = range(nb_vertex)
+        weights = np.array(self.get_adj_matrix(), dtype=np.float64)
+        return held_karp(weights, starting_vertex, ending_vertex)
+
     def get_all_hamilton_path(self):
         """Compute all the possible hamilton paths.
 
@@ -314,35 +1410,131 @@ class Graph():
 
         return self.get_hamilton_path(range(self.nb_vertex), range(self.nb_vertex))
 
-    def get_hamilton_path(self, starting_vertex=None, ending_vertex=None):
+    @memoize
+    def count_hamilton_paths(self, starting_vertex=None, ending_vertex=None):
+        """Count the hamilton paths starting in `starting_vertex` and ending in `ending_vertex`.
+
+        The paths are counted with a bitmask dynamic programming algorithm, none of them is built.
+
+        :param iterable starting_vertex: An iterable containing the starting vertices. (Default None, every vertex)
+        :param iterable ending_vertex: An iterable containing the ending vertices. (Default None, every vertex)
+        :raises OverflowError: If a partial count may not fit in int64, see `hamilton._count_hamilton_dp`.
+        :return: The number of Hamilton paths.
+        :rtype: int
+        """
+
+        nb_vertex = self.nb_vertex
+        if starting_vertex is None:
+            starting_vertex = range(nb_vertex)
+        if ending_vertex is None:
+            ending_vertex = range(nb_vertex)
+        return count_hamilton_paths(self._get_adjacency(), starting_vertex, ending_vertex)
+
+    @memoize
+    def count_hamilton_paths_matrix(self):
+        """Count the hamilton paths between every pair of vertices, one pass per starting vertex.
+
+        :raises OverflowError: If a count may not fit in int64.
+        :return: A matrix whose element (i, j) is the number of Hamilton paths from i to j.
+        :rtype: numpy.ndarray
+        """
+
+        return count_hamilton_paths_matrix(self._get_adjacency())
+
+    def _get_adjacency(self):
+        """Get the 0/1 adjacency matrix of the graph, with a null diagonal."""
+
+        adjacency = np.isfinite(self.get_adj_matrix()).astype(np.int64)
+        np.fill_diagonal(adjacency, 0)
+        return adjacency
+
+    def get_hamilton_path(self, starting_vertex=None, ending_vertex=None, processes=1):
         """Compute all the hamilton starting in `starting_vertex` and ending in `ending_vertex`.
 
-        :param iterable starting_vertex: An iterable containing the starting vertices.
-        :param iterable ending_vertex: An iterable containing the ending vertices.
+        The enumeration isn't memoized, it can hold a factorial number of paths: only the
+        counts and the shortest paths derived from it are kept, see `memoize`.
+
+        :param iterable starting_vertex: An iterable containing the starting vertices. (Default None, every vertex)
+        :param iterable ending_vertex: An iterable containing the ending vertices. (Default None, every vertex)
+        :param int processes: The number of worker processes, None for one per CPU. (Default 1, no process pool)
         :return: An list containing all the valid Hamilton paths.
         :rtype: list
         """
 
-        all_path = []
-        for i in starting_vertex:
-            self._backtrack_hamilton([i], all_path)
-        all_path = [path for path in all_path if path[-1] in ending_vertex]
-        return all_path
+        if processes == 1:
+            return list(self.iter_hamilton_path(starting_vertex, ending_vertex))
+        return self._parallel_hamilton(starting_vertex, ending_vertex, False, processes)
 
-    def _backtrack_hamilton(self, path, all_path):
-        """Recursive algorithm to compute all the hamilton path starting at path[0].
+    def _parallel_hamilton(self, starting_vertex, ending_vertex, best_only, processes):
+        """Search the hamilton paths in a process pool, one task per first edge.
 
-        :param iterable path: The current path being tested.
-        :param iterable all_path: An iterable storing all the hamilton path.
+        :return: All the Hamilton paths, or a list containing the shortest one if `best_only`.
+        :rtype: list
         """
 
-        if path.count(path[-1]) == 2:
-            return None
-        elif len(path) == self.nb_vertex:
-            all_path.append(path)
-        for n in self.get_neighbors(path[-1]):
-            new_path = path + [n]
-            self._backtrack_hamilton(new_path, all_path)
+        nb_vertex = self.nb_vertex
+        if starting_vertex is None:
+            starting_vertex = range(nb_vertex)
+        if ending_vertex is None:
+            ending_vertex = range(nb_vertex)
+        weights = self.get_adj_matrix().tolist()
+        return parallel_backtrack_hamilton(self._get_neighbor_lists(), weights, starting_vertex, ending_vertex,
+                                           best_only, processes)
+
+    @memoize
+    def k_shortest_hamilton_paths(self, k, starting_vertex=None, ending_vertex=None):
+        """Compute the `k` shortest hamilton paths without enumerating all of them.
+
+        The search prunes the branches heavier than the k-th best path found so far,
+        and only the `k` best paths are kept in memory.
+
+        :param int k: The number of paths.
+        :param iterable starting_vertex: An iterable containing the starting vertices. (Default None, every vertex)
+        :param iterable ending_vertex: An iterable containing the ending vertices. (Default None, every vertex)
+        :return: At most `k` (path, weight) tuples sorted by increasing weight, fewer if
+            the graph has less Hamilton paths.
+        :rtype: list
+        """
+
+        if k < 1:
+            return []
+        nb_vertex = self.nb_vertex
+        if starting_vertex is None:
+            starting_vertex = range(nb_vertex)
+        if ending_vertex is None:
+            ending_vertex = range(nb_vertex)
+        weights = self.get_adj_matrix().tolist()
+        # Min-heap on the opposite of the weights: the root is the heaviest of the k best paths,
+        # the latest found first on ties.
+        best = []
+        paths = backtrack_hamilton(self._get_neighbor_lists(), weights, starting_vertex, ending_vertex, True, k=k,
+                                   with_weight=True)
+        for i, (path, weight) in enumerate(paths):
+            item = (-weight, -i, path)
+            if len(best) < k:
+                heapq.heappush(best, item)
+            else:
+                heapq.heapreplace(best, item)
+        return [(path, -weight) for weight, i, path in sorted(best, reverse=True)]
+
+    def iter_hamilton_path(self, starting_vertex=None, ending_vertex=None, best_only=False):
+        """Lazily generate the hamilton paths starting in `starting_vertex` and ending in `ending_vertex`.
+
+        :param iterable starting_vertex: An iterable containing the starting vertices. (Default None, every vertex)
+        :param iterable ending_vertex: An iterable containing the ending vertices. (Default None, every vertex)
+        :param bool best_only: Prune the branches heavier than the best path found so far
+            and only yield the improving paths if True. (Default False)
+        :return: A generator of Hamilton paths.
+        :rtype: generator
+        """
+
+        nb_vertex = self.nb_vertex
+        if starting_vertex is None:
+            starting_vertex = range(nb_vertex)
+        if ending_vertex is None:
+            ending_vertex = range(nb_vertex)
+        weights = self.get_adj_matrix().tolist() if best_only else None
+        return backtrack_hamilton(self._get_neighbor_lists(), weights, starting_vertex, ending_vertex, best_only)
 
     def set_path(self, vertices):
         """Convert the graph to a path graph
@@ -351,16 +1543,18 @@ class Graph():
         """
 
         edges = [(vertices[i], vertices[i + 1]) for i in range(len(vertices) - 1)]
-        weights = [self.adj_matrix[edge[0], edge[1]] for edge in edges]
+        weights = [self.get_weight(edge[0], edge[1]) for edge in edges]
         self.rem_all_edges()
         for i in range(len(edges)):
             self.add_edge(edges[i], weights[i])
 
     def __getattr__(self, key):
         if key == "nb_vertex":
-            return self.adj_matrix.shape[0]
+            return self._nb_vertex
+        if key == "adj_matrix":
+            return self.get_adj_matrix()
         if key == "nb_edge":
-            return len(self.get_edges())  # TODO: more efficient solution.
+            return len(self._get_edge_arrays()[0])
 
     def __str__(self):
-        return self.adj_matrix.__str__()
+        return self.get_adj_matrix().__str__()
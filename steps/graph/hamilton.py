@@ -0,0 +1,539 @@
+from functools import lru_cache
+from math import factorial, inf
+from multiprocessing import Pool, Value
+import heapq
+import os
+import random
+import time
+import numpy as np
+from .unionfind import RollbackUnionFind
+
+
+@lru_cache(maxsize=32)
+def get_subset_layers(nb_vertex):
+    """Group the bitmasks of every subset of `nb_vertex` vertices by cardinality.
+
+    The result is cached and shared between the calls, it must not be modified.
+
+    :param int nb_vertex: The number of vertices.
+    :return: A list whose k-th element is an array containing the bitmasks of the subsets of size k.
+    :rtype: list of numpy.ndarray
+    """
+
+    masks = np.arange(1 << nb_vertex, dtype=np.int64)
+    cardinality = np.zeros(masks.shape, dtype=np.int64)
+    for i in range(nb_vertex):
+        cardinality += (masks >> i) & 1
+    order = np.argsort(cardinality, kind="stable")
+    bounds = np.bincount(cardinality, minlength=nb_vertex + 1).cumsum()
+    return np.split(masks[order], bounds[:-1])
+
+
+def held_karp(weights, starting_vertex, ending_vertex):
+    """Compute the shortest Hamilton path with the Held-Karp dynamic programming algorithm.
+
+    `dp[mask, j]` is the weight of the shortest path visiting exactly the vertices of `mask`
+    and ending at `j`. The subsets are processed by cardinality so that every layer is
+    computed with vectorized operations. Runs in O(2^n·n²) time and O(2^n·n) memory.
+
+    :param numpy.ndarray weights: The adjacency matrix, `inf` meaning no edge.
+    :param iterable starting_vertex: An iterable containing the starting vertices.
+    :param iterable ending_vertex: An iterable containing the ending vertices.
+    :return: The shortest path and its weight if such a path exists, None otherwise.
+    :rtype: tuple or None
+    """
+
+    nb_vertex = len(weights)
+    ending_vertex = list(ending_vertex)
+    if nb_vertex == 0 or not ending_vertex:
+        return None
+    dp = np.full((1 << nb_vertex, nb_vertex), inf, dtype=weights.dtype)
+    for vertex in starting_vertex:
+        dp[1 << vertex, vertex] = 0
+    for layer in get_subset_layers(nb_vertex)[2:]:
+        for j in range(nb_vertex):
+            masks = layer[(layer >> j) & 1 == 1]
+            dp[masks, j] = (dp[masks ^ (1 << j)] + weights[:, j]).min(axis=1)
+
+    mask = (1 << nb_vertex) - 1
+    end = ending_vertex[int(np.argmin(dp[mask, ending_vertex]))]
+    weight = dp[mask, end]
+    if weight == inf:
+        return None
+    path = [end]
+    while mask != 1 << path[-1]:
+        previous_mask = mask ^ (1 << path[-1])
+        path.append(int(np.argmin(dp[previous_mask] + weights[:, path[-1]])))
+        mask = previous_mask
+    return path[::-1], weight
+
+
+def _count_hamilton_dp(adjacency, starting_vertex):
+    """Count the paths from `starting_vertex` visiting every vertex, by ending vertex.
+
+    `dp[mask, j]` is the number of paths visiting exactly the vertices of `mask` and
+    ending at `j`. Such a path read backwards from `j` picks a neighbor at every step,
+    so `dp[mask, j]` is at most (n - 1)! and at most `max_degree`^(n - 1): the int64
+    cells can't overflow below 22 vertices, or on graphs of low degree.
+
+    :raises OverflowError: If a count may not fit in an int64 cell.
+    :return: The number of Hamilton paths ending at every vertex.
+    :rtype: numpy.ndarray
+    """
+
+    nb_vertex = len(adjacency)
+    max_degree = int(adjacency.sum(axis=1).max())
+    if min(factorial(nb_vertex - 1), max_degree ** (nb_vertex - 1)) > np.iinfo(np.int64).max:
+        raise OverflowError("The Hamilton path counts may not fit in int64.")
+    dp = np.zeros((1 << nb_vertex, nb_vertex), dtype=np.int64)
+    for vertex in starting_vertex:
+        dp[1 << vertex, vertex] = 1
+    for layer in get_subset_layers(nb_vertex)[2:]:
+        for j in range(nb_vertex):
+            masks = layer[(layer >> j) & 1 == 1]
+            dp[masks, j] = dp[masks ^ (1 << j)] @ adjacency[:, j]
+    return dp[-1]
+
+
+def count_hamilton_paths(adjacency, starting_vertex, ending_vertex):
+    """Count the Hamilton paths with a bitmask dynamic programming algorithm.
+
+    `dp[mask, j]` is the number of paths visiting exactly the vertices of `mask` and
+    ending at `j`. No path is built. Runs in O(2^n·n²) time and O(2^n·n) memory. The
+    counts of the ending vertices are added as Python integers, so the total doesn't
+    overflow, see `_count_hamilton_dp` for the cells.
+
+    :param numpy.ndarray adjacency: The 0/1 adjacency matrix of the graph, with a null diagonal.
+    :param iterable starting_vertex: An iterable containing the starting vertices.
+    :param iterable ending_vertex: An iterable containing the ending vertices.
+    :raises OverflowError: If a count may not fit in an int64 cell.
+    :return: The number of Hamilton paths.
+    :rtype: int
+    """
+
+    if len(adjacency) == 0:
+        return 0
+    counts = _count_hamilton_dp(adjacency, starting_vertex)
+    return sum(int(counts[vertex]) for vertex in ending_vertex)
+
+
+def count_hamilton_paths_matrix(adjacency):
+    """Count the Hamilton paths between every pair of vertices.
+
+    Runs the dynamic programming of `count_hamilton_paths` once per starting vertex,
+    which fills one row of the matrix. Runs in O(2^n·n³) time and O(2^n·n) memory.
+
+    :param numpy.ndarray adjacency: The 0/1 adjacency matrix of the graph, with a null diagonal.
+    :raises OverflowError: If a count may not fit in an int64 cell.
+    :return: A matrix whose element (i, j) is the number of Hamilton paths from i to j.
+    :rtype: numpy.ndarray
+    """
+
+    nb_vertex = len(adjacency)
+    counts = np.zeros((nb_vertex, nb_vertex), dtype=np.int64)
+    for vertex in range(nb_vertex):
+        counts[vertex] = _count_hamilton_dp(adjacency, [vertex])
+    return counts
+
+
+# Below this number of unvisited vertices the pruning test costs more than the search.
+PRUNING_MIN_REMAINING = 4
+
+
+def can_complete_hamilton(union_find, neighbor_masks, current, remaining, ending_mask):
+    """Check that a partial path ending at `current` may still become a Hamilton path.
+
+    The unvisited vertices plus `current` must be connected, which is checked by adding
+    their edges to `union_find` and rolling it back afterwards. An unvisited vertex with
+    a single neighbor among them can only be the last vertex of the path, so there can be
+    at most one such vertex and it must be an ending vertex.
+
+    :param RollbackUnionFind union_find: An union-find over all the vertices, restored on return.
+    :param list neighbor_masks: The bitmask of the neighbors of every vertex.
+    :param int current: The last vertex of the partial path.
+    :param int remaining: The bitmask of the unvisited vertices.
+    :param int ending_mask: The bitmask of the ending vertices.
+    :return: False if the partial path can't be completed, True if it may be.
+    :rtype: bool
+    """
+
+    allowed = remaining | (1 << current)
+    snapshot = union_find.snapshot()
+    nb_set = union_find.nb_set
+    nb_dead_end = 0
+    feasible = True
+    bits = remaining
+    while bits:
+        low = bits & -bits
+        bits ^= low
+        vertex = low.bit_length() - 1
+        links = neighbor_masks[vertex] & allowed
+        if links & (links - 1) == 0:
+            nb_dead_end += 1
+            if links == 0 or nb_dead_end > 1 or not ending_mask & low:
+                feasible = False
+                break
+        if links >> current & 1:
+            union_find.union(vertex, current)
+        links &= ~((low << 1) - 1)
+        while links:
+            neighbor = links & -links
+            links ^= neighbor
+            union_find.union(vertex, neighbor.bit_length() - 1)
+    if feasible:
+        feasible = nb_set - union_find.nb_set == bin(allowed).count("1") - 1
+    union_find.rollback(snapshot)
+    return feasible
+
+
+def backtrack_hamilton(neighbors, weights, starting_vertex, ending_vertex, best_only=False, prefixes=None, shared_bound=None,
+                       prune=True, k=1, with_weight=False):
+    """Lazily enumerate the Hamilton paths with an iterative depth-first search.
+
+    The visited vertices are kept in a bitmask and the current path is extended and
+    shrunk in place, so the memory stays proportional to the number of vertices.
+    The branches whose unvisited vertices became disconnected or have more than one
+    dead end are cut early.
+    In `best_only` mode the branches whose partial weight is not lower than the best
+    complete path found so far are pruned, and only the improving paths are yielded:
+    the last one is the shortest. With `k` greater than 1 the bound is the k-th best
+    weight found so far, only the weights of the k best paths are kept, and the k
+    shortest paths are among the last k paths yielded.
+
+    :param list neighbors: The list of the neighbors of every vertex.
+    :param list weights: The adjacency matrix as nested lists, used in `best_only` mode.
+    :param iterable starting_vertex: An iterable containing the starting vertices.
+    :param iterable ending_vertex: An iterable containing the ending vertices.
+    :param bool best_only: Only yield paths shorter than the previous ones if True. (Default False)
+    :param iterable prefixes: The paths to extend, replacing `starting_vertex` if given. (Default None)
+    :param shared_bound: A `multiprocessing.Value` holding the best weight found by all
+        the processes, used to prune in `best_only` mode. (Default None)
+    :param bool prune: Cut the branches that can't be completed, see `can_complete_hamilton`. (Default True)
+    :param int k: The number of shortest paths searched in `best_only` mode, `shared_bound`
+        requires 1. (Default 1)
+    :param bool with_weight: Yield (path, weight) tuples instead of paths, the weights are
+        computed in `best_only` mode only, 0 otherwise. (Default False)
+    :return: A generator of Hamilton paths.
+    :rtype: generator
+    """
+
+    full_mask = (1 << len(neighbors)) - 1
+    ending_mask = 0
+    for vertex in ending_vertex:
+        ending_mask |= 1 << vertex
+    neighbor_masks = []
+    for adjacent in neighbors:
+        neighbor_mask = 0
+        for vertex in adjacent:
+            neighbor_mask |= 1 << vertex
+        neighbor_masks.append(neighbor_mask)
+    union_find = RollbackUnionFind(len(neighbors))
+    if prefixes is None:
+        prefixes = [[vertex] for vertex in starting_vertex]
+    bound = inf
+    # Max-heap of the weights of the k best paths found so far.
+    best_weights = []
+    for prefix in prefixes:
+        path = list(prefix)
+        path_weight = [0]
+        visited = 1 << path[0]
+        for i in range(1, len(path)):
+            visited |= 1 << path[i]
+            if best_only:
+                path_weight.append(path_weight[-1] + weights[path[i - 1]][path[i]])
+            else:
+                path_weight.append(0)
+        if visited == full_mask:
+            if ending_mask >> path[-1] & 1 and (not best_only or path_weight[-1] < bound):
+                bound = _push_best_weight(best_weights, path_weight[-1], k)
+                yield (path, path_weight[-1]) if with_weight else path
+            continue
+        depth = len(path)
+        stack = [iter(neighbors[path[-1]])]
+        while stack:
+            for vertex in stack[-1]:
+                if visited >> vertex & 1:
+                    continue
+                weight = 0
+                if best_only:
+                    weight = path_weight[-1] + weights[path[-1]][vertex]
+                    if weight >= bound or (shared_bound is not None and weight > shared_bound.value):
+                        continue
+                if visited | (1 << vertex) == full_mask:
+                    if ending_mask >> vertex & 1:
+                        bound = _push_best_weight(best_weights, weight, k)
+                        if shared_bound is not None and weight < shared_bound.value:
+                            with shared_bound.get_lock():
+                                shared_bound.value = min(shared_bound.value, weight)
+                        yield (path + [vertex], weight) if with_weight else path + [vertex]
+                    continue
+                remaining = full_mask ^ visited ^ (1 << vertex)
+                if (prune and bin(remaining).count("1") >= PRUNING_MIN_REMAINING
+                        and not can_complete_hamilton(union_find, neighbor_masks, vertex, remaining, ending_mask)):
+                    continue
+                path.append(vertex)
+                path_weight.append(weight)
+                visited |= 1 << vertex
+                stack.append(iter(neighbors[vertex]))
+                break
+            else:
+                stack.pop()
+                if len(path) > depth:
+                    visited ^= 1 << path.pop()
+                    path_weight.pop()
+
+
+def _push_best_weight(best_weights, weight, k):
+    """Add `weight` to the max-heap of the `k` best weights and return the new pruning bound."""
+
+    if len(best_weights) < k:
+        heapq.heappush(best_weights, -weight)
+    else:
+        heapq.heapreplace(best_weights, -weight)
+    if len(best_weights) < k:
+        return inf
+    return -best_weights[0]
+
+
+_worker_search = None
+
+
+def _init_worker(neighbors, weights, ending_vertex, best_only, shared_bound):
+    global _worker_search
+    _worker_search = (neighbors, weights, ending_vertex, best_only, shared_bound)
+
+
+def _hamilton_worker(prefix):
+    neighbors, weights, ending_vertex, best_only, shared_bound = _worker_search
+    paths = list(backtrack_hamilton(neighbors, weights, None, ending_vertex, best_only, [prefix], shared_bound))
+    if best_only:
+        return paths[-1:]
+    return paths
+
+
+def parallel_backtrack_hamilton(neighbors, weights, starting_vertex, ending_vertex, best_only=False, processes=None):
+    """Run `backtrack_hamilton` in a process pool, one task per first edge of the paths.
+
+    Splitting on the first edge instead of the starting vertex gives smaller tasks that
+    balance better between the processes. The results are merged in the order of the
+    sequential search. In `best_only` mode the processes share the best weight found so
+    far to prune their branches.
+
+    :param list neighbors: The list of the neighbors of every vertex.
+    :param list weights: The adjacency matrix as nested lists, used in `best_only` mode.
+    :param iterable starting_vertex: An iterable containing the starting vertices.
+    :param iterable ending_vertex: An iterable containing the ending vertices.
+    :param bool best_only: Only return the shortest path if True. (Default False)
+    :param int processes: The number of worker processes. (Default None, one per CPU)
+    :return: The Hamilton paths, or a list containing the shortest one in `best_only` mode.
+    :rtype: list
+    """
+
+    ending_vertex = list(ending_vertex)
+    prefixes = []
+    for vertex in starting_vertex:
+        if len(neighbors) == 1:
+            prefixes.append([vertex])
+        prefixes.extend([vertex, neighbor] for neighbor in neighbors[vertex])
+    shared_bound = Value("d", inf) if best_only else None
+    with Pool(processes, initializer=_init_worker,
+              initargs=(neighbors, weights, ending_vertex, best_only, shared_bound)) as pool:
+        results = pool.map(_hamilton_worker, prefixes)
+    paths = [path for result in results for path in result]
+    if not best_only or not paths:
+        return paths
+    path_weights = [sum(weights[path[i]][path[i + 1]] for i in range(len(path) - 1)) for path in paths]
+    return [paths[path_weights.index(min(path_weights))]]
+
+
+def _get_anytime_costs(weights, starting_vertex, ending_vertex):
+    """Build the cost matrix used by the local search of `anytime_hamilton`.
+
+    The missing edges cost a penalty larger than the weight of any path. Two virtual
+    vertices `n` and `n + 1` are added at the beginning and at the end of every path,
+    linked to the starting (resp. ending) vertices for free and to the others for the
+    penalty. Every move is then evaluated the same way, endpoints included.
+
+    :return: The cost matrix and the penalty.
+    :rtype: tuple
+    """
+
+    nb_vertex = len(weights)
+    finite = np.isfinite(weights)
+    penalty = float(np.abs(weights[finite]).sum()) + 1
+    costs = np.full((nb_vertex + 2, nb_vertex + 2), penalty)
+    costs[:nb_vertex, :nb_vertex] = np.where(finite, weights, penalty)
+    costs[nb_vertex, list(starting_vertex)] = 0
+    costs[nb_vertex + 1, list(ending_vertex)] = 0
+    costs[:, nb_vertex] = costs[nb_vertex]
+    costs[:, nb_vertex + 1] = costs[nb_vertex + 1]
+    return costs, penalty
+
+
+def _nearest_neighbor_path(cost_matrix, nb_vertex, start, deadline):
+    # Past the deadline, the unvisited vertices are appended in index order.
+    path = [start]
+    visited = np.zeros(nb_vertex, dtype=bool)
+    visited[start] = True
+    for _ in range(nb_vertex - 1):
+        if time.monotonic() >= deadline:
+            path.extend(np.flatnonzero(~visited).tolist())
+            break
+        vertex = int(np.argmin(np.where(visited, inf, cost_matrix[path[-1], :nb_vertex])))
+        visited[vertex] = True
+        path.append(vertex)
+    return path
+
+
+def _spanning_tree_path(tree_neighbors, root, rng):
+    # The spanning forest of a disconnected graph: the other trees are visited after the root one.
+    path = []
+    visited = set()
+    roots = [vertex for vertex in range(len(tree_neighbors)) if vertex != root]
+    rng.shuffle(roots)
+    stack = roots + [root]
+    while stack:
+        vertex = stack.pop()
+        if vertex in visited:
+            continue
+        visited.add(vertex)
+        path.append(vertex)
+        children = [child for child in tree_neighbors[vertex] if child not in visited]
+        rng.shuffle(children)
+        stack.extend(children)
+    return path
+
+
+def _local_search(costs, path, deadline):
+    """Improve `path` in place with 2-opt and Or-opt moves until no move improves it.
+
+    `path` starts and ends with the virtual vertices, which never move. The moves are
+    evaluated with incremental delta costs and applied as soon as they improve the path.
+    The deadline is checked before every first vertex of a move, so the path is returned
+    as improved so far once it is passed.
+    """
+
+    size = len(path)
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        # 2-opt: reverse path[i:j + 1].
+        for i in range(1, size - 2):
+            if time.monotonic() >= deadline:
+                return path
+            cost_a = costs[path[i - 1]]
+            for j in range(i + 1, size - 1):
+                b, c, d = path[i], path[j], path[j + 1]
+                if cost_a[c] + costs[b][d] - cost_a[b] - costs[c][d] < -1e-9:
+                    path[i:j + 1] = path[i:j + 1][::-1]
+                    improved = True
+        # Or-opt: move path[i:i + length], possibly reversed, between path[k] and path[k + 1].
+        for length in (1, 2, 3):
+            i = 1
+            while i + length < size:
+                if time.monotonic() >= deadline:
+                    return path
+                p, first, last, q = path[i - 1], path[i], path[i + length - 1], path[i + length]
+                gain = costs[p][first] + costs[last][q] - costs[p][q]
+                move = None
+                for k in range(size - 1):
+                    if i - 1 <= k <= i + length - 1:
+                        continue
+                    a, b = path[k], path[k + 1]
+                    if costs[a][first] + costs[last][b] - costs[a][b] - gain < -1e-9:
+                        move = (k, False)
+                        break
+                    if costs[a][last] + costs[first][b] - costs[a][b] - gain < -1e-9:
+                        move = (k, True)
+                        break
+                if move is None:
+                    i += 1
+                    continue
+                k, reverse = move
+                segment = path[i:i + length]
+                if reverse:
+                    segment.reverse()
+                del path[i:i + length]
+                if k > i:
+                    k -= length
+                path[k + 1:k + 1] = segment
+                improved = True
+    return path
+
+
+def _path_cost(costs, path):
+    return sum(costs[path[i]][path[i + 1]] for i in range(len(path) - 1))
+
+
+def _anytime_worker(args):
+    cost_matrix, starting_vertex, tree_neighbors, deadline, seed = args
+    nb_vertex = len(cost_matrix) - 2
+    # Indexing nested lists is faster than numpy scalars in the local search.
+    costs = cost_matrix.tolist()
+    rng = random.Random(seed)
+    best_path, best_cost = None, inf
+    restart = 0
+    while restart == 0 or time.monotonic() < deadline:
+        start = rng.choice(starting_vertex)
+        if restart % 3 == 0:
+            path = _nearest_neighbor_path(cost_matrix, nb_vertex, start, deadline)
+        elif restart % 3 == 1 or best_path is None:
+            path = _spanning_tree_path(tree_neighbors, start, rng)
+        else:
+            # Double bridge kick on the best path.
+            path = best_path[1:-1]
+            if nb_vertex >= 8:
+                a, b, c = sorted(rng.sample(range(1, nb_vertex), 3))
+                path = path[:a] + path[b:c] + path[a:b] + path[c:]
+        path = _local_search(costs, [nb_vertex] + path + [nb_vertex + 1], deadline)
+        cost = _path_cost(costs, path)
+        if cost < best_cost:
+            best_path, best_cost = path, cost
+        restart += 1
+    return best_path[1:-1], best_cost
+
+
+def anytime_hamilton(weights, starting_vertex, ending_vertex, tree_edges, time_budget=1.0, processes=1, seed=None):
+    """Search a short Hamilton path with random restarts of a local search within a time budget.
+
+    Each restart builds a path with the nearest neighbor heuristic, a random preorder of
+    the minimum spanning tree or a double bridge kick of the best path, then improves it
+    with 2-opt and Or-opt moves. The restarts run in `processes` processes until the
+    budget is spent, checked during the construction and the moves, the budget starts
+    before the cost matrix is built. The result is not guaranteed to be the shortest path.
+
+    :param numpy.ndarray weights: The adjacency matrix, `inf` meaning no edge.
+    :param iterable starting_vertex: An iterable containing the starting vertices.
+    :param iterable ending_vertex: An iterable containing the ending vertices.
+    :param iterable tree_edges: The edges (i, j, ...) of a minimum spanning tree of the graph.
+    :param float time_budget: The wall-clock time budget in seconds. (Default 1.0)
+    :param int processes: The number of worker processes, None for one per CPU. (Default 1)
+    :param int seed: The seed of the random restarts. (Default None)
+    :return: The best path found and its weight if it is a Hamilton path, None otherwise.
+    :rtype: tuple or None
+    """
+
+    deadline = time.monotonic() + time_budget
+    nb_vertex = len(weights)
+    starting_vertex = list(starting_vertex)
+    ending_vertex = list(ending_vertex)
+    if nb_vertex == 0 or not starting_vertex or not ending_vertex:
+        return None
+    costs, penalty = _get_anytime_costs(weights, starting_vertex, ending_vertex)
+    tree_neighbors = [[] for i in range(nb_vertex)]
+    for edge in tree_edges:
+        tree_neighbors[edge[0]].append(edge[1])
+        tree_neighbors[edge[1]].append(edge[0])
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    tasks = [(costs, starting_vertex, tree_neighbors, deadline, seed + i) for i in range(processes)]
+    if processes == 1:
+        path, cost = _anytime_worker(tasks[0])
+    else:
+        with Pool(processes) as pool:
+            path, cost = min(pool.map(_anytime_worker, tasks), key=lambda result: result[1])
+    if cost >= penalty:
+        return None
+    return path, cost
@@ -0,0 +1,154 @@
+from math import inf
+from multiprocessing import Pool
+import heapq
+import os
+import numpy as np
+
+# Below this number of vertices starting a process pool costs more than it saves.
+PARALLEL_MIN_VERTEX = 512
+# A graph is considered sparse when it has less than this fraction of all the possible edges.
+SPARSE_DENSITY = 0.1
+
+_worker_neighbors = None
+
+
+def dijkstra(neighbors, source):
+    """Compute the minimal distances from `source` with Dijkstra algorithm and a binary heap.
+
+    :param list neighbors: For every vertex, a list of (neighbor, weight) tuples.
+    :param int source: The index of the source vertex.
+    :return: The minimal distance from `source` to every vertex, `inf` if unreachable.
+    :rtype: list
+    """
+
+    dist = [inf] * len(neighbors)
+    dist[source] = 0
+    heap = [(0, source)]
+    while heap:
+        distance, vertex = heapq.heappop(heap)
+        if distance > dist[vertex]:
+            continue
+        for neighbor, weight in neighbors[vertex]:
+            new_distance = distance + weight
+            if new_distance < dist[neighbor]:
+                dist[neighbor] = new_distance
+                heapq.heappush(heap, (new_distance, neighbor))
+    return dist
+
+
+def dijkstra_path(neighbors, source, target):
+    """Compute a shortest path from `source` to `target` with Dijkstra algorithm.
+
+    The search stops once `target` is reached, the path is rebuilt from the predecessors.
+
+    :param list neighbors: For every vertex, a list of (neighbor, weight) tuples.
+    :param int source: The index of the source vertex.
+    :param int target: The index of the target vertex.
+    :return: The indices of the vertices of the path, None if `target` is unreachable.
+    :rtype: list or None
+    """
+
+    dist = [inf] * len(neighbors)
+    previous = [-1] * len(neighbors)
+    dist[source] = 0
+    heap = [(0, source)]
+    while heap:
+        distance, vertex = heapq.heappop(heap)
+        if vertex == target:
+            break
+        if distance > dist[vertex]:
+            continue
+        for neighbor, weight in neighbors[vertex]:
+            new_distance = distance + weight
+            if new_distance < dist[neighbor]:
+                dist[neighbor] = new_distance
+                previous[neighbor] = vertex
+                heapq.heappush(heap, (new_distance, neighbor))
+    if dist[target] == inf:
+        return None
+    path = [target]
+    while path[-1] != source:
+        path.append(previous[path[-1]])
+    return path[::-1]
+
+
+def dist_path(neighbors, dist, source, target):
+    """Rebuild a shortest path from `source` to `target` with the distances from `source`.
+
+    Walking back from `target`, the predecessor is the unvisited neighbor `u` minimizing
+    `dist[u] + weight(u, v)`, the others can't be on a shortest path. The walk costs
+    O(length x degree) instead of a search. It gives up when every candidate was
+    visited, which only happens along edges of null weight.
+
+    :param list neighbors: For every vertex, a list of (neighbor, weight) tuples.
+    :param dist: The minimal distance from `source` to every vertex, `inf` if unreachable.
+    :param int source: The index of the source vertex.
+    :param int target: The index of the target vertex.
+    :return: The indices of the vertices of the path, None if `target` is unreachable or the walk gave up.
+    :rtype: list or None
+    """
+
+    if dist[target] == inf:
+        return None
+    path = [target]
+    visited = {target}
+    while path[-1] != source:
+        best, predecessor = inf, None
+        for neighbor, weight in neighbors[path[-1]]:
+            if neighbor not in visited and dist[neighbor] + weight < best:
+                best, predecessor = dist[neighbor] + weight, neighbor
+        if predecessor is None:
+            return None
+        path.append(predecessor)
+        visited.add(predecessor)
+    return path[::-1]
+
+
+def _init_worker(neighbors):
+    global _worker_neighbors
+    _worker_neighbors = neighbors
+
+
+def _dijkstra_worker(source):
+    return dijkstra(_worker_neighbors, source)
+
+
+def all_pairs_dijkstra(neighbors, processes=1):
+    """Compute the minimal distances between every vertex by running Dijkstra from every source.
+
+    :param list neighbors: For every vertex, a list of (neighbor, weight) tuples.
+    :param int processes: The number of worker processes, the sources are computed
+        in the current process if 1. (Default 1)
+    :return: Matrix of minimal distances between every vertex.
+    :rtype: numpy.ndarray
+    """
+
+    nb_vertex = len(neighbors)
+    dist = np.empty((nb_vertex, nb_vertex))
+    if processes == 1:
+        for source in range(nb_vertex):
+            dist[source] = dijkstra(neighbors, source)
+        return dist
+    chunksize = max(1, nb_vertex // (4 * processes))
+    with Pool(processes, initializer=_init_worker, initargs=(neighbors,)) as pool:
+        for source, row in enumerate(pool.imap(_dijkstra_worker, range(nb_vertex), chunksize)):
+            dist[source] = row
+    return dist
+
+
+def get_nb_processes(nb_vertex, nb_edge, processes=None):
+    """Choose the number of worker processes of `all_pairs_dijkstra`.
+
+    :param int nb_vertex: The number of vertices of the graph.
+    :param int nb_edge: The number of edges of the graph.
+    :param int processes: The number of processes asked by the user. (Default None, automatic)
+    :return: `processes` if given, the number of CPUs for large sparse graphs and 1 otherwise.
+    :rtype: int
+    """
+
+    if processes is not None:
+        return processes
+    max_edge = nb_vertex * (nb_vertex - 1) / 2
+    if nb_vertex >= PARALLEL_MIN_VERTEX and nb_edge < SPARSE_DENSITY * max_edge:
+        return os.cpu_count() or 1
+    return 1
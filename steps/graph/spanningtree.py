@@ -0,0 +1,296 @@
+from math import inf
+import numpy as np
+from .unionfind import ArrayUnionFind
+
+# Above this fraction of all the possible edges, `get_spanning_tree_method` picks Prim algorithm.
+PRIM_DENSITY = 0.1
+
+
+def kruskal(nb_vertex, index1, index2, weights):
+    """Compute a minimum spanning forest with Kruskal algorithm.
+
+    The edges are ordered with a stable `argsort` and united by batches with
+    `ArrayUnionFind.union_many`, until `nb_vertex` - 1 edges are accepted.
+
+    :param int nb_vertex: The number of vertices.
+    :param numpy.ndarray index1: The first vertex of every edge.
+    :param numpy.ndarray index2: The second vertex of every edge.
+    :param numpy.ndarray weights: The weight of every edge.
+    :return: The positions of the edges of the forest in the arrays.
+    :rtype: numpy.ndarray
+    """
+
+    disjoint_set = ArrayUnionFind(nb_vertex)
+    order = np.argsort(weights, kind="stable")
+    # The vectorized finds of a batch skip the edges connected by the previous batches.
+    batch_size = max(1024, nb_vertex)
+    accepted = [np.empty(0, dtype=np.intp)]
+    for start in range(0, len(order), batch_size):
+        if disjoint_set.nb_set <= 1:
+            break
+        batch = order[start:start + batch_size]
+        accepted.append(batch[disjoint_set.union_many(index1[batch], index2[batch])])
+    return np.concatenate(accepted)
+
+
+def prim(nb_vertex, get_row):
+    """Compute a minimum spanning forest with Prim algorithm on the rows of the adjacency matrix.
+
+    The distance of every vertex to the tree is kept in an array updated with one
+    vectorized step per vertex added, in O(n²) overall, which suits dense graphs.
+    A new tree is started when no vertex left is adjacent to the current one. The
+    rows are read one at a time, so the matrix doesn't need to be built.
+
+    :param int nb_vertex: The number of vertices.
+    :param callable get_row: Return the weights of the edges of a vertex, `inf` meaning no edge.
+    :return: The first vertices, the second vertices and the weights of the edges of the forest.
+    :rtype: tuple of numpy.ndarray
+    """
+
+    in_tree = np.zeros(nb_vertex, dtype=bool)
+    # The weight of the lightest edge between every vertex and the tree, `inf` once in the tree.
+    key = np.full(nb_vertex, inf)
+    parent = np.full(nb_vertex, -1, dtype=np.intp)
+    index1, index2, tree_weights = [], [], []
+    for _ in range(nb_vertex):
+        vertex = int(np.argmin(key))
+        if key[vertex] == inf:
+            vertex = int(np.argmin(in_tree))
+        else:
+            index1.append(min(parent[vertex], vertex))
+            index2.append(max(parent[vertex], vertex))
+            tree_weights.append(key[vertex])
+        in_tree[vertex] = True
+        key[vertex] = inf
+        row = get_row(vertex)
+        closer = (row < key) & ~in_tree
+        key[closer] = row[closer]
+        parent[closer] = vertex
+    return (np.array(index1, dtype=np.intp), np.array(index2, dtype=np.intp),
+            np.array(tree_weights, dtype=np.float64))
+
+
+def boruvka(nb_vertex, index1, index2, weights):
+    """Compute a minimum spanning forest with Borůvka algorithm.
+
+    Every round, each component picks its lightest outgoing edge, all the components
+    at once with vectorized operations, and the picked edges are united. The number of
+    components at least halves every round. The ties are broken by position in the
+    arrays, as in `kruskal`, so that the picked edges never close a cycle.
+
+    :param int nb_vertex: The number of vertices.
+    :param numpy.ndarray index1: The first vertex of every edge.
+    :param numpy.ndarray index2: The second vertex of every edge.
+    :param numpy.ndarray weights: The weight of every edge.
+    :return: The positions of the edges of the forest in the arrays.
+    :rtype: numpy.ndarray
+    """
+
+    nb_edge = len(weights)
+    disjoint_set = ArrayUnionFind(nb_vertex)
+    order = np.argsort(weights, kind="stable")
+    rank = np.empty(nb_edge, dtype=np.intp)
+    rank[order] = np.arange(nb_edge)
+    edges = np.arange(nb_edge)
+    accepted = [np.empty(0, dtype=np.intp)]
+    while edges.size > 0 and disjoint_set.nb_set > 1:
+        roots1 = disjoint_set.find_many(index1[edges])
+        roots2 = disjoint_set.find_many(index2[edges])
+        outgoing = roots1 != roots2
+        edges, roots1, roots2 = edges[outgoing], roots1[outgoing], roots2[outgoing]
+        if edges.size == 0:
+            break
+        lightest = np.full(nb_vertex, nb_edge, dtype=np.intp)
+        np.minimum.at(lightest, roots1, rank[edges])
+        np.minimum.at(lightest, roots2, rank[edges])
+        picked = order[np.unique(lightest[lightest < nb_edge])]
+        accepted.append(picked[disjoint_set.union_many(index1[picked], index2[picked])])
+    return np.concatenate(accepted)
+
+
+def get_spanning_tree_method(nb_vertex, nb_edge):
+    """Choose the minimum spanning tree algorithm from the density of the graph.
+
+    :param int nb_vertex: The number of vertices of the graph.
+    :param int nb_edge: The number of edges of the graph.
+    :return: "prim" for dense graphs, "kruskal" otherwise.
+    :rtype: str
+    """
+
+    max_edge = nb_vertex * (nb_vertex - 1) / 2
+    if nb_edge > PRIM_DENSITY * max_edge:
+        return "prim"
+    return "kruskal"
+
+
+class IncrementalSpanningForest:
+    """Minimum spanning forest maintained under edge insertions.
+
+    The components are tracked with an `ArrayUnionFind`: an edge between two
+    components is added to the forest. An edge inside a component closes a cycle
+    and replaces the heaviest edge of the path between its vertices if it is
+    lighter. The paths are queried on a link-cut tree whose nodes are the
+    vertices and the edges of the forest, so every insertion costs O(log n)
+    amortized. Only insertions are supported, a heavier weight for an edge of
+    the forest is ignored.
+
+    :param int nb_vertex: The number of vertices.
+    :param iterable edges: The (i, j, weight) edges inserted first, for example
+        the minimum spanning tree of a graph. (Default (), no edge)
+    """
+
+    def __init__(self, nb_vertex, edges=()):
+        self.nb_vertex = nb_vertex
+        self.union_find = ArrayUnionFind(nb_vertex)
+        self.weight = 0
+        # Link-cut tree: the nodes 0..nb_vertex-1 are the vertices, the next ones the edges.
+        self.left = [-1] * nb_vertex
+        self.right = [-1] * nb_vertex
+        self.parent = [-1] * nb_vertex
+        self.flip = [False] * nb_vertex
+        self.value = [-inf] * nb_vertex
+        self.best = list(range(nb_vertex))
+        self.ends = [None] * nb_vertex
+        for vertex1, vertex2, weight in edges:
+            self.add_edge(vertex1, vertex2, weight)
+
+    def add_edge(self, vertex1, vertex2, weight):
+        """Insert the edge (`vertex1`, `vertex2`) in the graph and update the forest.
+
+        :param int vertex1: The index of the first vertex.
+        :param int vertex2: The index of the second vertex.
+        :param weight: The weight of the edge.
+        :return: True if the edge entered the forest, False otherwise.
+        :rtype: bool
+        """
+
+        if vertex1 == vertex2:
+            return False
+        if self.union_find.union(vertex1, vertex2):
+            node = len(self.value)
+            self.left.append(-1)
+            self.right.append(-1)
+            self.parent.append(-1)
+            self.flip.append(False)
+            self.value.append(weight)
+            self.best.append(node)
+            self.ends.append(None)
+        else:
+            node = self._path_max(vertex1, vertex2)
+            if self.value[node] <= weight:
+                return False
+            old1, old2 = self.ends[node]
+            self._cut(old1, node)
+            self._cut(node, old2)
+            self.weight -= self.value[node]
+            self.left[node] = self.right[node] = self.parent[node] = -1
+            self.flip[node] = False
+            self.value[node] = weight
+            self.best[node] = node
+        self.ends[node] = (min(vertex1, vertex2), max(vertex1, vertex2))
+        self._link(vertex1, node)
+        self._link(node, vertex2)
+        self.weight += weight
+        return True
+
+    def get_edges(self):
+        """Get the edges of the forest.
+
+        :return: The (i, j, weight) edges of the forest, with i < j.
+        :rtype: set
+        """
+
+        return {(*self.ends[node], self.value[node]) for node in range(self.nb_vertex, len(self.value))}
+
+    def _is_root(self, node):
+        # Root of its splay tree: the parent pointer, if any, is a path-parent pointer.
+        parent = self.parent[node]
+        return parent < 0 or (self.left[parent] != node and self.right[parent] != node)
+
+    def _push(self, node):
+        if self.flip[node]:
+            left, right = self.left[node], self.right[node]
+            self.left[node], self.right[node] = right, left
+            if left >= 0:
+                self.flip[left] = not self.flip[left]
+            if right >= 0:
+                self.flip[right] = not self.flip[right]
+            self.flip[node] = False
+
+    def _update(self, node):
+        best = node
+        for child in (self.left[node], self.right[node]):
+            if child >= 0 and self.value[self.best[child]] > self.value[best]:
+                best = self.best[child]
+        self.best[node] = best
+
+    def _rotate(self, node):
+        parent = self.parent[node]
+        grandparent = self.parent[parent]
+        if not self._is_root(parent):
+            if self.left[grandparent] == parent:
+                self.left[grandparent] = node
+            else:
+                self.right[grandparent] = node
+        self.parent[node] = grandparent
+        if self.left[parent] == node:
+            child = self.right[node]
+            self.left[parent] = child
+            self.right[node] = parent
+        else:
+            child = self.left[node]
+            self.right[parent] = child
+            self.left[node] = parent
+        if child >= 0:
+            self.parent[child] = parent
+        self.parent[parent] = node
+        self._update(parent)
+        self._update(node)
+
+    def _splay(self, node):
+        path = [node]
+        while not self._is_root(path[-1]):
+            path.append(self.parent[path[-1]])
+        for ancestor in reversed(path):
+            self._push(ancestor)
+        while not self._is_root(node):
+            parent = self.parent[node]
+            if not self._is_root(parent):
+                grandparent = self.parent[parent]
+                if (self.left[grandparent] == parent) == (self.left[parent] == node):
+                    self._rotate(parent)
+                else:
+                    self._rotate(node)
+            self._rotate(node)
+
+    def _access(self, node):
+        last = -1
+        current = node
+        while current >= 0:
+            self._splay(current)
+            self.right[current] = last
+            self._update(current)
+            last = current
+            current = self.parent[current]
+        self._splay(node)
+
+    def _make_root(self, node):
+        self._access(node)
+        self.flip[node] = not self.flip[node]
+
+    def _link(self, node1, node2):
+        self._make_root(node1)
+        self.parent[node1] = node2
+
+    def _cut(self, node1, node2):
+        # `node2` is adjacent to `node1`: once `node1` is the root, it is alone on the left of `node2`.
+        self._make_root(node1)
+        self._access(node2)
+        self.left[node2] = -1
+        self.parent[node1] = -1
+        self._update(node2)
+
+    def _path_max(self, node1, node2):
+        self._make_root(node1)
+        self._access(node2)
+        return self.best[node2]
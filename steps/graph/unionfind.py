@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 class UnionFind:
@@ -20,11 +21,13 @@ class UnionFind:
             self.make_set(node)
 
     def find(self, node):
-        if self.index_map[node] != self.parents[self.index_map[node]]:
-            self.parents[self.index_map[node]] = self.find(self.parents[self.index_map[node]])
-            return self.parents[self.index_map[node]]
-        else:
-            return self.index_map[node]
+        # Iterative path halving: every visited node is linked to its grandparent.
+        parents = self.parents
+        index = self.index_map[node]
+        while index != parents[index]:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
 
     def union(self, node1, node2):
         root1 = self.find(node1)
@@ -47,3 +50,161 @@ class UnionFind:
                            "parent": parents
                            })
         return df.__str__()
+
+
+class RollbackUnionFind:
+    """Disjoint-set data structure whose unions can be undone.
+
+    The nodes are the integers from 0 to `nb_node` - 1. There is no path compression,
+    only union by size, so every union only changes one parent and can be rolled back
+    from an undo log, following a backtracking search.
+
+    :param int nb_node: The number of nodes.
+    """
+
+    def __init__(self, nb_node):
+        self.parents = list(range(nb_node))
+        self.size = [1] * nb_node
+        self.nb_set = nb_node
+        self.history = []
+
+    def find(self, node):
+        while node != self.parents[node]:
+            node = self.parents[node]
+        return node
+
+    def union(self, node1, node2):
+        root1 = self.find(node1)
+        root2 = self.find(node2)
+        if root1 == root2:
+            return False
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+        self.parents[root2] = root1
+        self.size[root1] += self.size[root2]
+        self.nb_set -= 1
+        self.history.append(root2)
+        return True
+
+    def snapshot(self):
+        """Return a marker of the current state to pass to `rollback`."""
+
+        return len(self.history)
+
+    def rollback(self, snapshot):
+        """Undo the unions made since `snapshot` was taken."""
+
+        while len(self.history) > snapshot:
+            root2 = self.history.pop()
+            root1 = self.parents[root2]
+            self.size[root1] -= self.size[root2]
+            self.parents[root2] = root2
+            self.nb_set += 1
+
+
+# `union_many` copies the arrays to lists when it has more than 1 / UNION_MANY_LIST_RATIO unions per node to make.
+UNION_MANY_LIST_RATIO = 16
+
+
+class ArrayUnionFind:
+    """Disjoint-set data structure stored in NumPy `int32` arrays.
+
+    The nodes are the integers from 0 to `nb_node` - 1, so there is no dictionary
+    lookup. `find` uses iterative path halving and `union` union by size.
+    `find_many` and `union_many` process whole batches of nodes or edges, the
+    vectorized `find_many` filtering the pairs already connected before the
+    remaining unions are made one by one.
+
+    :param int nb_node: The number of nodes.
+    """
+
+    def __init__(self, nb_node):
+        self.parents = np.arange(nb_node, dtype=np.int32)
+        self.size = np.ones(nb_node, dtype=np.int32)
+        self.nb_set = nb_node
+
+    def find(self, node):
+        parents = self.parents
+        while node != parents[node]:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return int(node)
+
+    def union(self, node1, node2):
+        """Merge the sets of `node1` and `node2`.
+
+        :return: True if they were in different sets, False otherwise.
+        :rtype: bool
+        """
+
+        return self._union_roots(self.find(node1), self.find(node2))
+
+    def _union_roots(self, root1, root2):
+        if root1 == root2:
+            return False
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+        self.parents[root2] = root1
+        self.size[root1] += self.size[root2]
+        self.nb_set -= 1
+        return True
+
+    def find_many(self, nodes):
+        """Find the root of every node of `nodes`, halving all their paths together.
+
+        :param nodes: An array of nodes.
+        :return: The array of their roots.
+        :rtype: numpy.ndarray
+        """
+
+        parents = self.parents
+        nodes = np.array(nodes, dtype=np.int32)
+        active = np.flatnonzero(parents[nodes] != nodes)
+        while active.size > 0:
+            current = nodes[active]
+            grandparents = parents[parents[current]]
+            parents[current] = grandparents
+            nodes[active] = grandparents
+            active = active[parents[grandparents] != grandparents]
+        return nodes
+
+    def union_many(self, nodes1, nodes2):
+        """Merge the sets of every pair (`nodes1[i]`, `nodes2[i]`), in order.
+
+        :param nodes1: An array of the first nodes of the pairs.
+        :param nodes2: An array of the second nodes of the pairs.
+        :return: A boolean array, True for the pairs that merged two different sets.
+        :rtype: numpy.ndarray
+        """
+
+        roots1 = self.find_many(nodes1)
+        roots2 = self.find_many(nodes2)
+        merged = roots1 != roots2
+        candidates = np.flatnonzero(merged)
+        pairs = zip(candidates.tolist(), roots1[candidates].tolist(), roots2[candidates].tolist())
+        # A previous pair of the batch may have connected the next candidates.
+        if len(candidates) < len(self.parents) // UNION_MANY_LIST_RATIO:
+            for i, root1, root2 in pairs:
+                merged[i] = self._union_roots(self.find(root1), self.find(root2))
+            return merged
+        # Many unions: Python lists index faster than NumPy scalars, the copies are amortized.
+        parents = self.parents.tolist()
+        size = self.size.tolist()
+        for i, root1, root2 in pairs:
+            while root1 != parents[root1]:
+                parents[root1] = parents[parents[root1]]
+                root1 = parents[root1]
+            while root2 != parents[root2]:
+                parents[root2] = parents[parents[root2]]
+                root2 = parents[root2]
+            if root1 == root2:
+                merged[i] = False
+                continue
+            if size[root1] < size[root2]:
+                root1, root2 = root2, root1
+            parents[root2] = root1
+            size[root1] += size[root2]
+            self.nb_set -= 1
+        self.parents[:] = parents
+        self.size[:] = size
+        return merged